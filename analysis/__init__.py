@@ -1,3 +1,8 @@
 from analysis.analysis import UserList
+from analysis.analysis import ActivityCube
+from analysis.analysis import TokenIndex
+from analysis.analysis import LinkIndex
 from analysis.analysis import Analyse
-from analysis.analysis import GroupSpecificAnalysis
\ No newline at end of file
+from analysis.analysis import GroupSpecificAnalysis
+from analysis.store import MessageStore
+from analysis.store import StoreAnalyse
\ No newline at end of file
@@ -8,12 +8,94 @@ Author: Abhishek Santosh Gupta
 GitHub: github.com/1abhi6
 """
 
-import emoji
+import os
+import re
+import copy
+import logging
+import numpy as np
 import pandas as pd
+from abc import ABC, abstractmethod
 from collections import Counter
-from urlextract import URLExtract
-import streamlit as st
-from functools import wraps
+from functools import wraps, lru_cache
+from concurrent.futures import ProcessPoolExecutor
+
+from preprocessor import backend as backends
+from preprocessor.preprocessor import PERIODS
+
+
+logger = logging.getLogger(__name__)
+
+
+# Stop-word list of a language, add a file here to support another language.
+# Resolved from this file so the results do not depend on the working directory.
+STOP_WORDS_PATH = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), os.pardir, 'dependencies', 'stop_{}.txt')
+
+# Languages whose stop words are filtered out of the most common words
+STOP_WORDS_LANGUAGES = ('hinglish',)
+
+
+# Messages WhatsApp leaves in place of media in chats exported without media
+MEDIA_MESSAGES = ['<Media omitted>', '<Media omitted>\n']
+
+# Every URL the extractor finds has a dotted TLD or IPv4 address, or is localhost
+URL_CANDIDATE_PATTERN = r'\.|(?i:localhost)'
+
+# Number of domains shown in the most shared domains
+TOP_DOMAINS = 10
+
+# Number of words shown in the word cloud
+WORD_CLOUD_WORDS = 100
+
+# Days of the week in calendar order, indexed by weekday code
+WEEKDAYS = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+
+# Months of the year in calendar order
+MONTHS = ['January', 'February', 'March', 'April', 'May', 'June',
+          'July', 'August', 'September', 'October', 'November', 'December']
+
+# Number of worker processes of the text metrics, 1 runs them in the main process
+WORKERS = 1
+
+# Number of messages each worker process handles at a time
+CHUNK_SIZE = 50000
+
+
+@lru_cache(maxsize=None)
+def load_stop_words(languages=STOP_WORDS_LANGUAGES):
+    """
+    Load the stop words of the given languages once per process.
+
+    Args:
+        languages (tuple): Languages with a stop-word file in `STOP_WORDS_PATH`.
+
+    Returns:
+        frozenset: Stop words of every language, one per line of their files.
+    """
+    stop_words = set()
+    for language in languages:
+        with open(STOP_WORDS_PATH.format(language), 'r', encoding='utf-8') as f:
+            stop_words.update(f.read().split())
+
+    return frozenset(stop_words)
+
+
+def stop_words_or_none(languages=STOP_WORDS_LANGUAGES):
+    """
+    Load the stop words of the given languages, or none when a file is missing.
+
+    Args:
+        languages (tuple): Languages with a stop-word file in `STOP_WORDS_PATH`.
+
+    Returns:
+        frozenset: Stop words of every language, empty if a file is missing.
+    """
+    try:
+        return load_stop_words(languages)
+    except FileNotFoundError:
+        logger.error('Stop-word files of %s not found, keeping every word.',
+                     ', '.join(languages))
+        return frozenset()
 
 
 def filter_selected_user(func):
@@ -53,24 +135,563 @@ class UserList:
         return user_list
 
 
+def _trie_pattern(node):
+    """
+    Build the regex matching every sequence stored in a character trie.
+
+    Args:
+        node (dict): Trie node, mapping each next character to its child and ''
+            to True where a sequence ends.
+
+    Returns:
+        str: Regex preferring the longest sequence at every branch.
+    """
+    branches = [re.escape(char) + _trie_pattern(child)
+                for char, child in node.items() if char]
+    if not branches:
+        return ''
+
+    pattern = '(?:' + '|'.join(branches) + ')'
+    return pattern + '?' if '' in node else pattern
+
+
+@lru_cache(maxsize=None)
+def url_extractor():
+    """
+    Build the URL extractor once per process, loading its TLD list a single time.
+
+    Returns:
+        URLExtract: The shared URL extractor.
+    """
+    # Imported on first use, loading it slows down the app start
+    from urlextract import URLExtract
+
+    return URLExtract()
+
+
+@lru_cache(maxsize=None)
+def emoji_regex():
+    """
+    Compile one regex matching every full emoji sequence once per process, so ZWJ
+    families, skin tones, flags and keycaps are matched whole.
+
+    Returns:
+        re.Pattern: The compiled emoji regex.
+    """
+    # Imported on first use, loading it slows down the app start
+    import emoji
+
+    trie = {}
+    for sequence in emoji.UNICODE_EMOJI['en']:
+        node = trie
+        for char in sequence:
+            node = node.setdefault(char, {})
+        node[''] = True
+
+    return re.compile(_trie_pattern(trie))
+
+
+def map_chunks(func, df, workers=WORKERS, chunk_size=CHUNK_SIZE):
+    """
+    Apply a function to consecutive chunks of messages, in a process pool when
+    more than one worker is requested.
+
+    Args:
+        func (function): Module-level function taking a chunk of the DataFrame.
+        df (pandas.DataFrame): The chat data as a DataFrame.
+        workers (int, optional): Number of worker processes.
+        chunk_size (int, optional): Number of messages per chunk.
+
+    Returns:
+        list: Result of every chunk, in chat order.
+    """
+    if workers <= 1 or len(df) <= chunk_size:
+        return [func(df)]
+
+    chunks = [df.iloc[start:start + chunk_size] for start in range(0, len(df), chunk_size)]
+
+    # Build the shared regex and extractor before forking so workers inherit them
+    emoji_regex()
+    url_extractor()
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(func, chunks))
+
+
+def _count_tokens(df):
+    tokens = df['message'].reset_index(drop=True).str.split().explode().dropna()
+    rows = tokens.index.to_numpy()
+
+    terms = pd.DataFrame({
+        'users': df['users'].to_numpy()[rows],
+        'media': df['message'].isin(MEDIA_MESSAGES).to_numpy()[rows],
+        'token': tokens.to_numpy(),
+        'position': np.arange(len(tokens)),
+    })
+
+    # Count every token and keep its first position to break ties the way
+    # Counter.most_common does
+    terms = terms.groupby(['users', 'media', 'token'], sort=False)[
+        'position'].agg(['size', 'min']).reset_index().rename(
+        columns={'size': 'count', 'min': 'first'})
+
+    return terms, len(tokens)
+
+
+def _extract_links(df):
+    messages = df['message'].reset_index(drop=True)
+
+    # Only messages that could hold a URL go through full extraction
+    candidates = messages[messages.str.contains(
+        URL_CANDIDATE_PATTERN, regex=True).astype(bool)]
+    urls = candidates.map(url_extractor().find_urls).explode().dropna()
+
+    return pd.DataFrame({
+        'users': df['users'].to_numpy()[urls.index.to_numpy()],
+        'url': urls.to_numpy(dtype=object),
+    })
+
+
+def link_domains(urls):
+    """
+    Find the domain of every URL, without its scheme, port and leading 'www.'.
+
+    Args:
+        urls (pandas.Series): The URLs.
+
+    Returns:
+        pandas.Series: The lowercased domain of every URL.
+    """
+    return urls.str.replace(
+        r'^[a-zA-Z][\w+.-]*://', '', regex=True).str.split(
+        r'[/:?#]', regex=True).str[0].str.lower().str.replace(
+        r'^www\.', '', regex=True)
+
+
+def _find_emojis(df):
+    messages = df['message'].reset_index(drop=True)
+
+    # Every emoji has a non-ASCII character, only search those messages
+    messages = messages[~messages.map(str.isascii).astype(bool)]
+
+    return messages.str.findall(emoji_regex()).explode().dropna()
+
+
+def _count_emojis(df):
+    return Counter(_find_emojis(df))
+
+
+def _count_user_emojis(df):
+    found = _find_emojis(df)
+
+    emojis = pd.DataFrame({
+        'users': df['users'].to_numpy()[found.index.to_numpy(dtype=np.int64)],
+        'emoji': found.to_numpy(dtype=object),
+        'position': np.arange(len(found)),
+    })
+
+    # Count every emoji by user and keep its first position to break ties the
+    # way Counter.most_common does
+    emojis = emojis.groupby(['users', 'emoji'], sort=False)['position'].agg(
+        ['size', 'min']).reset_index().rename(columns={'size': 'count', 'min': 'first'})
+
+    return emojis, len(found)
+
+
+# Per-message steps of the pandas backend, `analysis.polars_backend` has the
+# same steps for the polars backend
+PANDAS_STEPS = {
+    'count_tokens': _count_tokens,
+    'extract_links': _extract_links,
+    'count_emojis': _count_emojis,
+    'count_user_emojis': _count_user_emojis,
+}
+
+
+def map_step(step, df, backend='pandas', workers=WORKERS, chunk_size=CHUNK_SIZE):
+    """
+    Apply a per-message step of the chosen dataframe backend to the messages.
+
+    Args:
+        step (str): Name of the step, a key of `PANDAS_STEPS`.
+        df (pandas.DataFrame): The chat data as a DataFrame.
+        backend (str, optional): 'pandas' or 'polars'.
+        workers (int, optional): Number of worker processes of the pandas backend.
+        chunk_size (int, optional): Number of messages per chunk.
+
+    Returns:
+        list: Result of every chunk, in chat order.
+    """
+    # Polars already spreads every step over all cores, so it runs in one go
+    if backend == 'polars':
+        from . import polars_backend
+        return [getattr(polars_backend, step)(df)]
+
+    return map_chunks(PANDAS_STEPS[step], df, workers, chunk_size)
+
+
+def heatmap_table(activity):
+    """
+    Lay out message counts as a weekday by hour table.
+
+    Args:
+        activity (pandas.DataFrame): Message counts with day name and hour columns.
+
+    Returns:
+        pandas.DataFrame: Number of messages of every day of the week (rows,
+        Monday first) and hour of the day (columns, by period label).
+    """
+    # One bincount over the weekday and hour codes fills the 7x24 matrix
+    weekday = pd.Categorical(activity['day_name'], categories=WEEKDAYS).codes
+    cells = weekday.astype(np.int64) * 24 + activity['hour'].to_numpy(dtype=np.int64)
+    counts = np.bincount(cells, weights=activity['count'], minlength=7 * 24)
+
+    return pd.DataFrame(
+        counts.reshape(7, 24).astype(np.int64),
+        index=pd.Index(WEEKDAYS, name='day_name'),
+        columns=pd.Index(PERIODS, name='Period'))
+
+
+def common_words_table(words):
+    """
+    Lay out the 20 most common words as the table of the most common words.
+
+    Args:
+        words (pandas.DataFrame): Word counts indexed by word, most frequent first.
+
+    Returns:
+        pandas.DataFrame: DataFrame containing the most common words and their frequencies.
+    """
+    words = words.head(20)
+
+    common_words = pd.DataFrame(list(zip(words.index, words['count'])))
+
+    common_words.rename(columns={
+        0: 'Words',
+        1: 'Frequency'
+    }, inplace=True)
+
+    return common_words
+
+
+class UserSlices(ABC):
+    """
+    Base class for aggregates of a chat built once and split into one slice per
+    user plus the whole chat, so switching users is a lookup.
+    """
+
+    def split(self, frame, overall, sort=True):
+        """
+        Store the rows of every user, and of the whole chat, as slices.
+
+        Args:
+            frame (pandas.DataFrame): Rows of every user, with a users column.
+            overall (pandas.DataFrame): Rows of the whole chat.
+            sort (bool, optional): Whether to store the users sorted by name.
+        """
+        self.slices = {
+            user: part.drop(columns='users').reset_index(drop=True)
+            for user, part in frame.groupby('users', sort=sort)
+        }
+        self.slices['Overall'] = overall
+        self.empty = overall.iloc[:0]
+
+    def slice(self, selected_user):
+        """
+        Fetch the slice of the selected user.
+
+        Args:
+            selected_user (str): The selected user for analysis.
+
+        Returns:
+            pandas.DataFrame: The rows of the selected user, empty if they have none.
+        """
+        return self.slices.get(selected_user, self.empty)
+
+    def merge(self, other):
+        """
+        Combine this aggregate with that of messages appended to the chat.
+
+        Args:
+            other (UserSlices): Aggregate of the appended messages, of the same class.
+
+        Returns:
+            UserSlices: Aggregate of the whole chat.
+        """
+        merged = copy.copy(self)
+        merged.slices = {
+            user: self.merge_slices(self.slice(user), other.slice(user))
+            for user in [*self.slices, *(user for user in other.slices if user not in self.slices)]
+        }
+
+        return merged
+
+    @abstractmethod
+    def merge_slices(self, earlier, later):
+        """
+        Combine the slice of a user with their slice of the appended messages.
+
+        Args:
+            earlier (pandas.DataFrame): The user's slice of this aggregate.
+            later (pandas.DataFrame): The user's slice of the appended messages.
+
+        Returns:
+            pandas.DataFrame: The user's slice of the whole chat.
+        """
+        pass
+
+
+class ActivityCube(UserSlices):
+    """
+    Class for aggregating the message counts of a chat once, by user, date and hour.
+
+    Every slice holds message counts by year, month, date, day name, hour and period.
+    """
+
+    def __init__(self, df):
+        """
+        Initialize the ActivityCube class.
+
+        Args:
+            df (pandas.DataFrame): The chat data as a DataFrame.
+        """
+        keys = ['year', 'month', 'date', 'day_name', 'hour', 'Period']
+        self.keys = keys
+
+        cube = df.groupby(['users'] + keys, observed=True).size().rename(
+            'count').reset_index()
+
+        # Store the keys with plain dtypes so every slice groups and sorts the
+        # same way whether or not the chat uses the compact schema
+        for column in cube.select_dtypes('category').columns:
+            cube[column] = cube[column].astype(cube[column].cat.categories.dtype)
+
+        self.split(cube, cube.groupby(keys)['count'].sum().reset_index())
+
+    def merge_slices(self, earlier, later):
+        return pd.concat([earlier, later]).groupby(self.keys)['count'].sum().reset_index()
+
+
+class TokenIndex(UserSlices):
+    """
+    Class for tokenizing the messages of a chat once and counting every token by user.
+
+    Every slice holds the count and first position of every token, split by
+    whether it comes from a media message.
+    """
+
+    def __init__(self, df, workers=WORKERS, chunk_size=CHUNK_SIZE, backend=None):
+        """
+        Initialize the TokenIndex class.
+
+        Args:
+            df (pandas.DataFrame): The chat data as a DataFrame.
+            workers (int, optional): Number of worker processes tokenizing the messages.
+            chunk_size (int, optional): Number of messages per worker chunk.
+            backend (str, optional): Dataframe backend tokenizing the messages.
+        """
+        partials = map_step('count_tokens', df[['users', 'message']],
+                            backends.resolve(backend), workers, chunk_size)
+
+        # Shift the first positions of every chunk past the tokens of the
+        # chunks before it, then merge the partial counts
+        offset = 0
+        frames = []
+        for terms, num_tokens in partials:
+            frames.append(terms.assign(first=terms['first'] + offset))
+            offset += num_tokens
+        self.num_tokens = offset
+
+        terms = frames[0]
+        if len(frames) > 1:
+            terms = pd.concat(frames, ignore_index=True).groupby(
+                ['users', 'media', 'token'], sort=False).agg(
+                count=('count', 'sum'), first=('first', 'min')).reset_index()
+
+        self.split(terms, terms.groupby(['media', 'token'], sort=False).agg(
+            count=('count', 'sum'), first=('first', 'min')).reset_index(), sort=False)
+
+    def merge(self, other):
+        merged = super().merge(other)
+        merged.num_tokens = self.num_tokens + other.num_tokens
+
+        return merged
+
+    def merge_slices(self, earlier, later):
+        later = later.assign(first=later['first'] + self.num_tokens)
+
+        return pd.concat([earlier, later], ignore_index=True).groupby(
+            ['media', 'token'], sort=False).agg(
+            count=('count', 'sum'), first=('first', 'min')).reset_index()
+
+
+class LinkIndex(UserSlices):
+    """
+    Class for extracting the links of a chat once and counting them by user and domain.
+
+    Every slice holds the URL and domain of every link, in chat order.
+    """
+
+    def __init__(self, df, workers=WORKERS, chunk_size=CHUNK_SIZE, backend=None):
+        """
+        Initialize the LinkIndex class.
+
+        Args:
+            df (pandas.DataFrame): The chat data as a DataFrame.
+            workers (int, optional): Number of worker processes extracting the links.
+            chunk_size (int, optional): Number of messages per worker chunk.
+            backend (str, optional): Dataframe backend extracting the links.
+        """
+        links = pd.concat(
+            map_step('extract_links', df[['users', 'message']],
+                     backends.resolve(backend), workers, chunk_size),
+            ignore_index=True)
+        links['domain'] = link_domains(links['url'])
+
+        self.counts = links.groupby('users', sort=False).size()
+        self.split(links, links.drop(columns='users'), sort=False)
+
+    def merge(self, other):
+        merged = super().merge(other)
+        merged.counts = pd.concat([self.counts, other.counts]).groupby(level=0, sort=False).sum()
+
+        return merged
+
+    def merge_slices(self, earlier, later):
+        return pd.concat([earlier, later], ignore_index=True)
+
+
 class Analyse(UserList):
     """
     Class for performing various analyses on the WhatsApp chat data.
     """
 
-    def __init__(self, df, selected_user):
+    def __init__(self, df, selected_user, cube=None, tokens=None, links=None,
+                 languages=STOP_WORDS_LANGUAGES, workers=WORKERS, chunk_size=CHUNK_SIZE,
+                 backend=None):
         """
         Initialize the Analyse class.
 
         Args:
             df (pandas.DataFrame): The chat data as a DataFrame.
             selected_user (str): The selected user for analysis.
+            cube (ActivityCube or function, optional): Precomputed message counts
+                of the chat, or a function loading them on first use. Built from
+                the selected user's messages on first use if not given.
+            tokens (TokenIndex or function, optional): Precomputed token counts of
+                the chat, or a function loading them on first use. Built from the
+                selected user's messages on first use if not given.
+            links (LinkIndex or function, optional): Precomputed links of the chat,
+                or a function loading them on first use. Built from the selected
+                user's messages on first use if not given.
+            languages (tuple, optional): Languages whose stop words are left out of
+                the most common words.
+            workers (int, optional): Number of worker processes of the text metrics.
+            chunk_size (int, optional): Number of messages per worker chunk.
+            backend (str, optional): Dataframe backend of the per-message steps,
+                see `preprocessor.backend.resolve()`.
         """
         self.selected_user = selected_user
+        self.cube = cube
+        self.tokens = tokens
+        self.links = links
+        self.languages = tuple(languages)
+        self.workers = workers
+        self.chunk_size = chunk_size
+        self.backend = backends.resolve(backend)
         super().__init__(df)
+
+        # Filtering scans the whole chat, so it waits until a metric needs the
+        # selected user's messages
+        self.chat = df
         if self.selected_user != 'Overall':
-            self.df = self.df[self.df['users'] == self.selected_user]
-        self.extract_url = URLExtract()
+            self._df = None
+
+    @property
+    def df(self):
+        """
+        The messages of the selected user, filtered from the chat on first use.
+
+        Returns:
+            pandas.DataFrame: The selected user's messages.
+        """
+        if self._df is None:
+            df = self.chat[self.chat['users'] == self.selected_user]
+
+            # Compact DataFrames keep every category after filtering, drop the
+            # unused ones so counts match the object-dtype schema
+            categorical = df.select_dtypes('category').columns
+            if len(categorical):
+                df = df.assign(**{
+                    column: df[column].cat.remove_unused_categories()
+                    for column in categorical
+                })
+            self._df = df
+
+        return self._df
+
+    @df.setter
+    def df(self, df):
+        self._df = df
+
+    def index(self, name, build):
+        """
+        Fetch an index of the chat, loading or building it on first use.
+
+        Args:
+            name (str): The attribute holding the index, its loader or None.
+            build (function): Builds the index from the selected user's messages.
+
+        Returns:
+            UserSlices: The index.
+        """
+        index = getattr(self, name)
+        if index is None:
+            index = build()
+        elif callable(index):
+            index = index()
+        setattr(self, name, index)
+
+        return index
+
+    def activity(self):
+        """
+        Fetch the message counts of the selected user from the activity cube.
+
+        Returns:
+            pandas.DataFrame: Message counts by year, month, date, day name, hour and period.
+        """
+        return self.index('cube', lambda: ActivityCube(self.df)).slice(self.selected_user)
+
+    def words(self):
+        """
+        Fetch the token counts of the selected user from the token index.
+
+        Returns:
+            pandas.DataFrame: Count and first position of every token, split by
+            whether it comes from a media message.
+        """
+        return self.index('tokens', lambda: TokenIndex(
+            self.df, self.workers, self.chunk_size, self.backend)).slice(self.selected_user)
+
+    def urls(self):
+        """
+        Fetch the links of the selected user from the link index.
+
+        Returns:
+            pandas.DataFrame: URL and domain of every link, in chat order.
+        """
+        return self.links_index().slice(self.selected_user)
+
+    def links_index(self):
+        """
+        Fetch the link index of the chat.
+
+        Returns:
+            LinkIndex: The links of every user.
+        """
+        return self.index('links', lambda: LinkIndex(
+            self.df, self.workers, self.chunk_size, self.backend))
 
     def num_messages(self):
         """
@@ -79,7 +700,7 @@ class Analyse(UserList):
         Returns:
             int: Total number of messages.
         """
-        return self.df.shape[0]
+        return int(self.activity()['count'].sum())
 
     def total_words(self):
         """
@@ -88,10 +709,7 @@ class Analyse(UserList):
         Returns:
             int: Total number of words.
         """
-        words = []
-        for message in self.df['message']:
-            words.extend(message.split())
-        return len(words)
+        return int(self.words()['count'].sum())
 
     def media_shared(self):
         """
@@ -112,75 +730,58 @@ class Analyse(UserList):
         Returns:
             int: Number of links shared.
         """
-        links = []
-        for message in self.df['message']:
-            links.extend(self.extract_url.find_urls(message))
-
-        return len(links)
+        return len(self.urls())
 
-    def word_cloud(self):
+    def top_domains(self):
         """
-        Generate the word cloud of frequently used words.
+        Find the most shared domains in the chat.
 
         Returns:
-            str: Text containing all the words.
+            pandas.DataFrame: DataFrame containing the most shared domains and their number of links.
         """
-        if self.selected_user != 'Overall':
-            df = self.df[self.df['users'] == self.selected_user]
-
-        df = pd.DataFrame(self.df['message'])
+        domains = self.urls()['domain'].value_counts().head(TOP_DOMAINS)
 
-        # Combine all the messages into a single string
-        text = ' '.join(df['message'].tolist())
+        return domains.rename_axis('Domain').reset_index(name='Links')
 
-        # Remove '<Media omitted>' from the text
-        text = text.replace('<Media omitted>', '')
-
-        return text
-
-    def most_common_words(self):
+    def word_counts(self):
         """
-        Find the most common words in the chat.
+        Count the words of the selected user, leaving out media messages and stop
+        words and merging every casing of a word.
 
         Returns:
-            pandas.DataFrame: DataFrame containing the most common words and their frequencies.
+            pandas.DataFrame: Count and first position of every lowercased word,
+            most frequent first, ties in order of first use.
         """
-        try:
-            f = open('./dependencies/stop_hinglish.txt', 'r')
-            stop_words = f.read()
-        except FileNotFoundError:
-            st.error(
-                'The server is unable to fetch the required file. Please try again later.')
-
-        try:
-            if self.selected_user != 'Overall':
-                df = self.df[self.df['users'] == self.selected_user]
+        stop_words = stop_words_or_none(self.languages)
 
-            df = self.df
+        words = self.words()
+        words = words[~words['media']]
 
-            temp = df[df['users'] != 'group_notification']
-            temp = temp[temp['message'] != '<Media omitted>\n']
-            temp = temp[temp['message'] != '<Media omitted>']
+        # Merge the counts of every casing, then drop the stop words
+        words = words.groupby(words['token'].str.lower(), sort=False).agg(
+            count=('count', 'sum'), first=('first', 'min'))
+        words = words[~words.index.isin(stop_words)]
 
-            words = []
+        return words.sort_values(['count', 'first'], ascending=[False, True])
 
-            for message in temp['message']:
-                for word in message.lower().split():
-                    if word not in stop_words:
-                        words.append(word)
-
-            common_words = pd.DataFrame(Counter(words).most_common(20))
+    def word_cloud(self):
+        """
+        Generate the word frequencies of the word cloud, leaving out media messages
+        and stop words.
 
-        except Exception:
-            st.write(
-                'The data you provided has fewer metrics to show more about the selected user.')
+        Returns:
+            dict: Frequency of the `WORD_CLOUD_WORDS` most common words.
+        """
+        return self.word_counts()['count'].head(WORD_CLOUD_WORDS).to_dict()
 
-        common_words.rename(columns={
-            0: 'Words',
-            1: 'Frequency'
-        }, inplace=True)
+    def most_common_words(self):
+        """
+        Find the most common words in the chat.
 
-        return common_words
+        Returns:
+            pandas.DataFrame: DataFrame containing the most common words and their frequencies.
+        """
+        return common_words_table(self.word_counts())
 
     def most_used_emojis(self):
         """
@@ -189,18 +790,14 @@ class Analyse(UserList):
         Returns:
             pandas.DataFrame: DataFrame containing the most used emojis and their frequencies.
         """
-        if self.selected_user != 'Overall':
-            df = self.df[self.df['users'] == self.selected_user]
-
-        df = self.df
+        # Merging keeps the first-seen order of every emoji, so ties rank
+        # the same as counting the whole chat at once
+        emojis = Counter()
+        for partial in map_step('count_emojis', self.df[['message']], self.backend,
+                                self.workers, self.chunk_size):
+            emojis.update(partial)
 
-        emojis = []
-        for message in df['message']:
-            emojis.extend(
-                [c for c in message if c in emoji.UNICODE_EMOJI['en']])
-
-        most_used_emojis = pd.DataFrame(
-            Counter(emojis).most_common(len(Counter(emojis))))
+        most_used_emojis = pd.DataFrame(emojis.most_common())
 
         most_used_emojis.rename(columns={
             0: 'Emojis',
@@ -216,13 +813,8 @@ class Analyse(UserList):
         Returns:
             pandas.DataFrame: DataFrame containing the timeline of message counts.
         """
-        if self.selected_user != 'Overall':
-            df = self.df[self.df['users'] == self.selected_user]
-
-        df = self.df
-
-        timeline = df.groupby(['year', 'month']).count()[
-            'message'].reset_index()
+        timeline = self.activity().groupby(
+            ['year', 'month'])['count'].sum().reset_index()
 
         time = []
         for i in range(timeline.shape[0]):
@@ -231,7 +823,7 @@ class Analyse(UserList):
 
         timeline.rename(columns={
             'time': 'Time (Month-Year)',
-            'message': 'Number of Messages'
+            'count': 'Number of Messages'
         }, inplace=True)
 
         return timeline
@@ -243,16 +835,12 @@ class Analyse(UserList):
         Returns:
             pandas.DataFrame: DataFrame containing the daily timeline of message counts.
         """
-        if self.selected_user != 'Overall':
-            df = self.df[self.df['users'] == self.selected_user]
-
-        df = self.df
-
-        daily_timeline = df.groupby('date').count()['message'].reset_index()
+        daily_timeline = self.activity().groupby(
+            'date')['count'].sum().reset_index()
 
         daily_timeline.rename(columns={
             'date': 'Time (Date)',
-            'message': 'Number of Messages'
+            'count': 'Number of Messages'
         }, inplace=True)
 
         return daily_timeline
@@ -264,16 +852,10 @@ class Analyse(UserList):
         Returns:
             pandas.DataFrame: DataFrame containing the most active day of the week and the number of messages on that day.
         """
-        if self.selected_user != 'Overall':
-            df = self.df[self.df['users'] == self.selected_user]
+        most_active_day_of_week = self.activity().groupby(
+            'day_name')['count'].sum()
 
-        df = self.df
-
-        most_active_day_of_week = df['day_name'].value_counts()
-
-        weekdays = ['Monday', 'Tuesday', 'Wednesday',
-                    'Thursday', 'Friday', 'Saturday', 'Sunday']
-        sorted_series = most_active_day_of_week.reindex(weekdays)
+        sorted_series = most_active_day_of_week.reindex(WEEKDAYS)
 
         index_lst = []
         values_lst = []
@@ -299,17 +881,10 @@ class Analyse(UserList):
         Returns:
             pandas.DataFrame: DataFrame containing the most active month and the number of messages in that month.
         """
-        if self.selected_user != 'Overall':
-            df = self.df[self.df['users'] == self.selected_user]
-
-        df = self.df
-
-        most_active_month = df['month'].value_counts()
+        most_active_month = self.activity().groupby(
+            'month')['count'].sum()
 
-        months = ["January", "February", "March", "April", "May", "June",
-                  "July", "August", "September", "October", "November", "December"]
-
-        sorted_series = most_active_month.reindex(months)
+        sorted_series = most_active_month.reindex(MONTHS)
 
         index_lst = []
         values_lst = []
@@ -332,17 +907,10 @@ class Analyse(UserList):
         Generate the activity heatmap.
 
         Returns:
-            pandas.DataFrame: DataFrame containing the activity heatmap.
+            pandas.DataFrame: Number of messages of every day of the week (rows,
+            Monday first) and hour of the day (columns, by period label).
         """
-        if self.selected_user != 'Overall':
-            df = self.df[self.df['users'] == self.selected_user]
-
-        df = self.df
-
-        pivot_table = df.pivot_table(
-            index='day_name', columns='Period', values='message', aggfunc='count').fillna(0)
-
-        return pivot_table
+        return heatmap_table(self.activity())
 
 
 class GroupSpecificAnalysis(Analyse):
@@ -380,3 +948,16 @@ class GroupSpecificAnalysis(Analyse):
             columns={'index': 'User Name', 'users': 'Chat Percentage'})
 
         return users
+
+    def links_by_user(self):
+        """
+        Count the number of links shared by each user in the group.
+
+        Returns:
+            pandas.DataFrame: DataFrame containing the user names and the number of links they shared.
+        """
+        counts = self.links_index().counts.sort_values(ascending=False, kind='stable')
+        if self.selected_user != 'Overall':
+            counts = counts[counts.index == self.selected_user]
+
+        return counts.rename_axis('User Name').reset_index(name='Links Shared')
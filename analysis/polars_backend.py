@@ -0,0 +1,153 @@
+# -*- coding: utf-8 -*-
+"""
+WhatsApp Chat Analyzer - Polars Backend
+
+This module runs the per-message steps of the analysis with Polars, see
+`preprocessor.backend`. Every step takes and returns the same values as its
+pandas counterpart in `analysis.analysis.PANDAS_STEPS`, so the indexes and
+metrics built on them are identical for both backends. The activity cube
+stays on pandas for both, its single groupby is cheaper than handing the
+columns to Polars.
+
+Author: Abhishek Santosh Gupta
+GitHub: github.com/1abhi6
+"""
+
+from collections import Counter
+
+import polars as pl
+
+from .analysis import MEDIA_MESSAGES, URL_CANDIDATE_PATTERN, emoji_regex, url_extractor
+
+
+# A token is a run of characters str.split() does not split on. Python's
+# whitespace also covers the \x1c-\x1f separators, Polars' does not.
+TOKEN_PATTERN = r'[^\s\x1c-\x1f]+'
+
+# Messages with a non-ASCII character, every emoji has one
+NON_ASCII_PATTERN = r'[^\x00-\x7f]'
+
+
+def _to_polars(df, columns):
+    """
+    Convert columns of the chat DataFrame to Polars, with plain strings in
+    place of categoricals.
+
+    Args:
+        df (pandas.DataFrame): The chat data as a DataFrame.
+        columns (list): Columns to convert.
+
+    Returns:
+        polars.DataFrame: The converted columns.
+    """
+    frame = pl.from_pandas(df[columns])
+    return frame.with_columns(pl.col(pl.Categorical).cast(pl.String))
+
+
+def count_tokens(df):
+    """
+    Count every whitespace-separated token by user and whether it comes from a
+    media message.
+
+    Args:
+        df (pandas.DataFrame): The users and messages of the chat.
+
+    Returns:
+        tuple: Count and first position of every token in order of first use,
+        and the number of tokens.
+    """
+    message = pl.col('message')
+    tokens = _to_polars(df, ['users', 'message']).select(
+        'users',
+        message.is_in(MEDIA_MESSAGES).alias('media'),
+        message.str.extract_all(TOKEN_PATTERN).alias('token'),
+    ).explode('token').drop_nulls('token').with_row_index('position')
+
+    # Count every token and keep its first position to break ties the way
+    # Counter.most_common does
+    terms = tokens.group_by('users', 'media', 'token', maintain_order=True).agg(
+        pl.len().cast(pl.Int64).alias('count'),
+        pl.col('position').min().cast(pl.Int64).alias('first'))
+
+    return terms.to_pandas(), len(tokens)
+
+
+def extract_links(df):
+    """
+    Extract every URL of the messages, with the user who shared it.
+
+    Args:
+        df (pandas.DataFrame): The users and messages of the chat.
+
+    Returns:
+        pandas.DataFrame: User and URL of every link, in chat order.
+    """
+    # Only messages that could hold a URL go through full extraction
+    candidates = _to_polars(df, ['users', 'message']).filter(
+        pl.col('message').str.contains(URL_CANDIDATE_PATTERN))
+
+    links = candidates.select(
+        'users',
+        pl.Series('url', [url_extractor().find_urls(message)
+                          for message in candidates['message']],
+                  dtype=pl.List(pl.String)),
+    ).explode('url').drop_nulls('url')
+
+    return links.to_pandas()
+
+
+def _find_emojis(df, columns):
+    """
+    Extract every emoji of the messages, one row per emoji in chat order.
+
+    Args:
+        df (pandas.DataFrame): The chat data as a DataFrame.
+        columns (list): Columns kept next to the emoji, besides the message.
+
+    Returns:
+        polars.DataFrame: The kept columns and the emoji of every match.
+    """
+    messages = _to_polars(df, columns + ['message']).filter(
+        pl.col('message').str.contains(NON_ASCII_PATTERN))
+
+    return messages.select(
+        *columns,
+        pl.col('message').str.extract_all(emoji_regex().pattern).alias('emoji'),
+    ).explode('emoji').drop_nulls('emoji')
+
+
+def count_emojis(df):
+    """
+    Count every emoji of the messages.
+
+    Args:
+        df (pandas.DataFrame): The messages of the chat.
+
+    Returns:
+        collections.Counter: Number of uses of every emoji, in order of first use.
+    """
+    counts = _find_emojis(df, []).group_by('emoji', maintain_order=True).len()
+
+    return Counter(dict(zip(counts['emoji'], counts['len'])))
+
+
+def count_user_emojis(df):
+    """
+    Count every emoji of the messages by user.
+
+    Args:
+        df (pandas.DataFrame): The users and messages of the chat.
+
+    Returns:
+        tuple: Count and first position of every emoji by user in order of first
+        use, and the number of emojis.
+    """
+    found = _find_emojis(df, ['users']).with_row_index('position')
+
+    # Keep the first position of every emoji to break ties the way
+    # Counter.most_common does
+    emojis = found.group_by('users', 'emoji', maintain_order=True).agg(
+        pl.len().cast(pl.Int64).alias('count'),
+        pl.col('position').min().cast(pl.Int64).alias('first'))
+
+    return emojis.to_pandas(), len(found)
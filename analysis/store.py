@@ -0,0 +1,567 @@
+# -*- coding: utf-8 -*-
+"""
+WhatsApp Chat Analyzer - Message Store
+
+This module keeps parsed chats in an embedded SQLite database and runs every
+analysis metric as an SQL aggregation, for archives too big to hold as a
+DataFrame per session.
+
+Chats are loaded one parsed block at a time. Next to the messages, the
+per-block token, emoji and link counts are stored, so the text metrics are
+aggregations too. Only the result of a metric is ever held in memory, and
+every session shares the same database file.
+
+Author: Abhishek Santosh Gupta
+GitHub: github.com/1abhi6
+"""
+
+import os
+import sqlite3
+from itertools import repeat
+from contextlib import contextmanager
+
+import pandas as pd
+
+from preprocessor import backend as backends
+
+from .analysis import (STOP_WORDS_LANGUAGES, TOP_DOMAINS, WORD_CLOUD_WORDS, WEEKDAYS, MONTHS,
+                       stop_words_or_none, common_words_table, link_domains, heatmap_table,
+                       map_step)
+
+
+# Database file the messages are stored in
+STORE_PATH = './.cache/messages.sqlite'
+
+# Seconds a session waits for another one to finish loading a chat
+STORE_TIMEOUT = 600
+
+# Messages counted as media shared, the same as `Analyse.media_shared()`
+MEDIA_SHARED = ('<Media omitted>', '<Media omitted\n>')
+
+# Tables of the store. Every row of the token, emoji and link tables holds
+# the counts of one parsed block, a metric sums them over the blocks.
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS chats (
+    id INTEGER PRIMARY KEY,
+    key TEXT NOT NULL UNIQUE,
+    messages INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS messages (
+    id INTEGER PRIMARY KEY,
+    chat INTEGER NOT NULL,
+    datetime TEXT NOT NULL,
+    users TEXT NOT NULL,
+    message TEXT NOT NULL,
+    year INTEGER NOT NULL,
+    month TEXT NOT NULL,
+    day INTEGER NOT NULL,
+    day_name TEXT NOT NULL,
+    hour INTEGER NOT NULL,
+    date TEXT NOT NULL,
+    period TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS messages_users ON messages (chat, users);
+CREATE INDEX IF NOT EXISTS messages_datetime ON messages (chat, datetime);
+CREATE TABLE IF NOT EXISTS tokens (
+    chat INTEGER NOT NULL,
+    users TEXT NOT NULL,
+    media INTEGER NOT NULL,
+    word TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    first INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS tokens_users ON tokens (chat, users);
+CREATE TABLE IF NOT EXISTS emojis (
+    chat INTEGER NOT NULL,
+    users TEXT NOT NULL,
+    emoji TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    first INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS emojis_users ON emojis (chat, users);
+CREATE TABLE IF NOT EXISTS links (
+    chat INTEGER NOT NULL,
+    users TEXT NOT NULL,
+    url TEXT NOT NULL,
+    domain TEXT NOT NULL,
+    position INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS links_users ON links (chat, users);
+'''
+
+
+class MessageStore:
+    """
+    Class for storing parsed chats and their token, emoji and link counts in SQLite.
+    """
+
+    def __init__(self, path=STORE_PATH):
+        """
+        Initialize the MessageStore class.
+
+        Args:
+            path (str, optional): Path of the database file, created if missing.
+        """
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+        with self.connect() as con:
+            # Sessions keep querying while another one loads a chat
+            con.execute('PRAGMA journal_mode=WAL')
+            con.executescript(SCHEMA)
+
+    @contextmanager
+    def connect(self):
+        """
+        Open a connection to the database. Every call gets its own, so sessions
+        on different threads never share one.
+
+        Yields:
+            sqlite3.Connection: Connection in autocommit mode, closed on exit.
+        """
+        con = sqlite3.connect(self.path, timeout=STORE_TIMEOUT, isolation_level=None)
+        try:
+            yield con
+        finally:
+            con.close()
+
+    def chat_id(self, key):
+        """
+        Look up the id of a stored chat.
+
+        Args:
+            key (str): The cache key of the chat.
+
+        Returns:
+            int or None: Id of the chat, None if it is not stored.
+        """
+        with self.connect() as con:
+            row = con.execute('SELECT id FROM chats WHERE key = ?', (key,)).fetchone()
+
+        return row[0] if row else None
+
+    def put(self, key, frames, backend=None):
+        """
+        Store a chat one parsed block at a time, with the token, emoji and link
+        counts of every block. The chat only becomes visible once it is fully
+        stored, and a chat another session stored first is kept as is.
+
+        Args:
+            key (str): The cache key of the chat.
+            frames (iterable): Parsed DataFrames of the chat in order, e.g.
+                `ChunkedPreprocess(file).iter_frames()`.
+            backend (str, optional): Dataframe backend counting the tokens and links.
+
+        Returns:
+            int: Id of the chat.
+        """
+        backend = backends.resolve(backend)
+
+        with self.connect() as con:
+            con.execute('BEGIN IMMEDIATE')
+            try:
+                row = con.execute('SELECT id FROM chats WHERE key = ?', (key,)).fetchone()
+                if row:
+                    con.execute('ROLLBACK')
+                    return row[0]
+
+                chat = con.execute('INSERT INTO chats (key) VALUES (?)', (key,)).lastrowid
+
+                # Positions of the first token, emoji and link of the next block
+                offsets = (0, 0, 0)
+                messages = 0
+                for frame in frames:
+                    offsets = self._put_frame(con, chat, frame, offsets, backend)
+                    messages += len(frame)
+
+                con.execute('UPDATE chats SET messages = ? WHERE id = ?', (messages, chat))
+                con.execute('COMMIT')
+
+            except BaseException:
+                con.execute('ROLLBACK')
+                raise
+
+        return chat
+
+    def _put_frame(self, con, chat, frame, offsets, backend):
+        token_offset, emoji_offset, link_offset = offsets
+        timestamp = frame['datetime']
+
+        con.executemany(
+            'INSERT INTO messages (chat, datetime, users, message, year, month, day, '
+            'day_name, hour, date, period) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+            zip(repeat(chat), timestamp.dt.strftime('%Y-%m-%d %H:%M:%S').tolist(),
+                frame['users'].tolist(), frame['message'].tolist(), frame['year'].tolist(),
+                frame['month'].tolist(), frame['day'].tolist(), frame['day_name'].tolist(),
+                frame['hour'].tolist(), timestamp.dt.strftime('%Y-%m-%d').tolist(),
+                frame['Period'].tolist()))
+
+        # Merge every casing of a token here, SQLite only lowercases ASCII
+        terms, num_tokens = map_step('count_tokens', frame[['users', 'message']], backend)[0]
+        terms = terms.groupby(['users', 'media', terms['token'].str.lower().rename('word')],
+                              sort=False).agg(count=('count', 'sum'), first=('first', 'min'))
+        terms = terms.reset_index()
+        con.executemany(
+            'INSERT INTO tokens VALUES (?, ?, ?, ?, ?, ?)',
+            zip(repeat(chat), terms['users'].tolist(), terms['media'].tolist(),
+                terms['word'].tolist(), terms['count'].tolist(),
+                (terms['first'] + token_offset).tolist()))
+
+        emojis, num_emojis = map_step('count_user_emojis', frame[['users', 'message']],
+                                      backend)[0]
+        con.executemany(
+            'INSERT INTO emojis VALUES (?, ?, ?, ?, ?)',
+            zip(repeat(chat), emojis['users'].tolist(), emojis['emoji'].tolist(),
+                emojis['count'].tolist(), (emojis['first'] + emoji_offset).tolist()))
+
+        links = map_step('extract_links', frame[['users', 'message']], backend)[0]
+        con.executemany(
+            'INSERT INTO links VALUES (?, ?, ?, ?, ?)',
+            zip(repeat(chat), links['users'].tolist(), links['url'].tolist(),
+                link_domains(links['url']).tolist(),
+                range(link_offset, link_offset + len(links))))
+
+        return token_offset + num_tokens, emoji_offset + num_emojis, link_offset + len(links)
+
+    def remove(self, key):
+        """
+        Remove a stored chat.
+
+        Args:
+            key (str): The cache key of the chat.
+        """
+        chat = self.chat_id(key)
+        if chat is None:
+            return
+
+        with self.connect() as con:
+            con.execute('BEGIN IMMEDIATE')
+            for table in ('messages', 'tokens', 'emojis', 'links'):
+                con.execute('DELETE FROM {} WHERE chat = ?'.format(table), (chat,))
+            con.execute('DELETE FROM chats WHERE id = ?', (chat,))
+            con.execute('COMMIT')
+
+    def clear(self):
+        """
+        Remove every stored chat and shrink the database file.
+        """
+        with self.connect() as con:
+            con.execute('BEGIN IMMEDIATE')
+            for table in ('chats', 'messages', 'tokens', 'emojis', 'links'):
+                con.execute('DELETE FROM {}'.format(table))
+            con.execute('COMMIT')
+            con.execute('VACUUM')
+
+    def entries(self):
+        """
+        List the stored chats.
+
+        Returns:
+            pandas.DataFrame: Key and number of messages of every chat.
+        """
+        with self.connect() as con:
+            return pd.read_sql_query(
+                'SELECT key AS "Key", messages AS "Messages" FROM chats ORDER BY id', con)
+
+
+class StoreAnalyse:
+    """
+    Class for running the GroupSpecificAnalysis metrics of a stored chat as SQL aggregations.
+    """
+
+    def __init__(self, store, key, selected_user, languages=STOP_WORDS_LANGUAGES):
+        """
+        Initialize the StoreAnalyse class.
+
+        Args:
+            store (MessageStore): The store holding the chat.
+            key (str): The cache key of the chat.
+            selected_user (str): The selected user for analysis.
+            languages (tuple, optional): Languages whose stop words are left out of
+                the most common words.
+
+        Raises:
+            KeyError: If the chat is not stored.
+        """
+        if store.chat_id(key) is None:
+            raise KeyError('Chat {} is not in the message store.'.format(key))
+
+        self.store = store
+        self.selected_user = selected_user
+        self.languages = tuple(languages)
+
+        # Every query is limited to the chat, and to the selected user. The
+        # chat is looked up by key, its id changes if it is stored again.
+        self.where = 'chat = (SELECT id FROM chats WHERE key = ?)'
+        self.params = [key]
+        if selected_user != 'Overall':
+            self.where += ' AND users = ?'
+            self.params.append(selected_user)
+
+    def query(self, sql, params=()):
+        """
+        Run a query on the messages of the selected user.
+
+        Args:
+            sql (str): The query, with `{where}` in place of its filter.
+            params (tuple, optional): Parameters following those of the filter.
+
+        Returns:
+            pandas.DataFrame: The result of the query.
+        """
+        with self.store.connect() as con:
+            result = pd.read_sql_query(sql.format(where=self.where), con,
+                                       params=[*self.params, *params])
+
+        # Empty results come back with an object index
+        return result.reset_index(drop=True)
+
+    def scalar(self, sql, params=()):
+        """
+        Run a query returning a single value on the messages of the selected user.
+
+        Args:
+            sql (str): The query, with `{where}` in place of its filter.
+            params (tuple, optional): Parameters following those of the filter.
+
+        Returns:
+            The value of the query.
+        """
+        with self.store.connect() as con:
+            return con.execute(sql.format(where=self.where), [*self.params, *params]).fetchone()[0]
+
+    def user_list(self):
+        """
+        Fetch the list of users from the stored messages.
+
+        Returns:
+            list: List of users, in order of their first message.
+        """
+        user_list = self.query(
+            'SELECT users FROM messages WHERE {where} GROUP BY users ORDER BY MIN(id)'
+        )['users'].tolist()
+        user_list.remove('Group Notification')
+        user_list.insert(0, 'Overall')
+
+        return user_list
+
+    def num_messages(self):
+        """
+        Calculate the total number of messages.
+
+        Returns:
+            int: Total number of messages.
+        """
+        return self.scalar('SELECT COUNT(*) FROM messages WHERE {where}')
+
+    def total_words(self):
+        """
+        Calculate the total number of words.
+
+        Returns:
+            int: Total number of words.
+        """
+        return self.scalar('SELECT COALESCE(SUM(count), 0) FROM tokens WHERE {where}')
+
+    def media_shared(self):
+        """
+        Count the number of media shared.
+
+        Returns:
+            int: Number of media shared.
+        """
+        return self.scalar(
+            'SELECT COUNT(*) FROM messages WHERE {where} AND message IN (?, ?)', MEDIA_SHARED)
+
+    def links_shared(self):
+        """
+        Count the number of links shared.
+
+        Returns:
+            int: Number of links shared.
+        """
+        return self.scalar('SELECT COUNT(*) FROM links WHERE {where}')
+
+    def top_domains(self):
+        """
+        Find the most shared domains in the chat.
+
+        Returns:
+            pandas.DataFrame: DataFrame containing the most shared domains and their number of links.
+        """
+        return self.query(
+            'SELECT domain AS "Domain", COUNT(*) AS "Links" FROM links WHERE {where} '
+            'GROUP BY domain ORDER BY "Links" DESC, MIN(position) LIMIT ?', (TOP_DOMAINS,)
+        ).astype({'Links': 'int64'})
+
+    def word_counts(self):
+        """
+        Count the words of the selected user, leaving out media messages and stop
+        words and merging every casing of a word.
+
+        Returns:
+            pandas.DataFrame: Count and first position of the `WORD_CLOUD_WORDS`
+            most frequent lowercased words, ties in order of first use.
+        """
+        stop_words = stop_words_or_none(self.languages)
+
+        with self.store.connect() as con:
+            con.execute('CREATE TEMP TABLE stop_words (word TEXT PRIMARY KEY)')
+            con.executemany('INSERT INTO stop_words VALUES (?)', ((word,) for word in stop_words))
+
+            words = pd.read_sql_query(
+                'SELECT word, SUM(count) AS count, MIN(first) AS first FROM tokens '
+                'WHERE {} AND NOT media AND word NOT IN (SELECT word FROM temp.stop_words) '
+                'GROUP BY word ORDER BY count DESC, first LIMIT ?'.format(self.where),
+                con, params=[*self.params, WORD_CLOUD_WORDS])
+
+        return words.astype({'count': 'int64', 'first': 'int64'}).set_index('word')
+
+    def word_cloud(self):
+        """
+        Generate the word frequencies of the word cloud, leaving out media messages
+        and stop words.
+
+        Returns:
+            dict: Frequency of the `WORD_CLOUD_WORDS` most common words.
+        """
+        return self.word_counts()['count'].to_dict()
+
+    def most_common_words(self):
+        """
+        Find the most common words in the chat.
+
+        Returns:
+            pandas.DataFrame: DataFrame containing the most common words and their frequencies.
+        """
+        return common_words_table(self.word_counts())
+
+    def most_used_emojis(self):
+        """
+        Find the most used emojis in the chat.
+
+        Returns:
+            pandas.DataFrame: DataFrame containing the most used emojis and their frequencies.
+        """
+        emojis = self.query(
+            'SELECT emoji, SUM(count) AS count FROM emojis WHERE {where} '
+            'GROUP BY emoji ORDER BY count DESC, MIN(first) LIMIT 20')
+
+        most_used_emojis = pd.DataFrame(list(zip(emojis['emoji'], emojis['count'])))
+
+        most_used_emojis.rename(columns={
+            0: 'Emojis',
+            1: 'Frequency'
+        }, inplace=True)
+
+        return most_used_emojis
+
+    def timeline(self):
+        """
+        Generate the timeline of message counts.
+
+        Returns:
+            pandas.DataFrame: DataFrame containing the timeline of message counts.
+        """
+        timeline = self.query(
+            'SELECT year, month, COUNT(*) AS "Number of Messages" FROM messages '
+            'WHERE {where} GROUP BY year, month ORDER BY year, month'
+        ).astype({'year': 'int64', 'Number of Messages': 'int64'})
+
+        timeline['Time (Month-Year)'] = timeline['month'] + '-' + timeline['year'].astype(str)
+
+        return timeline
+
+    def daily_timeline(self):
+        """
+        Generate the daily timeline of message counts.
+
+        Returns:
+            pandas.DataFrame: DataFrame containing the daily timeline of message counts.
+        """
+        daily_timeline = self.query(
+            'SELECT date AS "Time (Date)", COUNT(*) AS "Number of Messages" FROM messages '
+            'WHERE {where} GROUP BY date ORDER BY date'
+        ).astype({'Number of Messages': 'int64'})
+
+        daily_timeline['Time (Date)'] = pd.to_datetime(daily_timeline['Time (Date)']).dt.date
+
+        return daily_timeline
+
+    def _counts_by(self, column, order):
+        counts = self.query(
+            'SELECT {0} AS key, COUNT(*) AS count FROM messages WHERE {{where}} '
+            'GROUP BY {0}'.format(column))
+        return counts.set_index('key')['count'].astype('int64').reindex(order)
+
+    def most_active_day_of_week(self):
+        """
+        Find the most active day of the week.
+
+        Returns:
+            pandas.DataFrame: DataFrame containing the most active day of the week and the number of messages on that day.
+        """
+        return self._counts_by('day_name', WEEKDAYS).rename_axis(
+            'Day of the Week').reset_index(name='Number of Messages')
+
+    def most_active_month(self):
+        """
+        Find the most active month.
+
+        Returns:
+            pandas.DataFrame: DataFrame containing the most active month and the number of messages in that month.
+        """
+        return self._counts_by('month', MONTHS).rename_axis(
+            'Month').reset_index(name='Number of Messages')
+
+    def activity_heatmap(self):
+        """
+        Generate the activity heatmap.
+
+        Returns:
+            pandas.DataFrame: Number of messages of every day of the week (rows,
+            Monday first) and hour of the day (columns, by period label).
+        """
+        return heatmap_table(self.query(
+            'SELECT day_name, hour, COUNT(*) AS count FROM messages WHERE {where} '
+            'GROUP BY day_name, hour'))
+
+    def _user_counts(self, limit=-1):
+        return self.query(
+            'SELECT users, COUNT(*) AS count FROM messages WHERE {where} '
+            'GROUP BY users ORDER BY count DESC, MIN(id) LIMIT ?', (limit,)
+        ).astype({'count': 'int64'})
+
+    def most_active_users(self):
+        """
+        Find the most active users in the group.
+
+        Returns:
+            pandas.DataFrame: DataFrame containing the most active users and the number of chats sent by them.
+        """
+        return self._user_counts(5).rename(
+            columns={'users': 'User Name', 'count': 'Number of Chats'})
+
+    def most_active_users_percentage(self):
+        """
+        Find the percentage of chats sent by each user in the group.
+
+        Returns:
+            pandas.DataFrame: DataFrame containing the user names and their chat percentages.
+        """
+        users = self._user_counts()
+        users['count'] = round(users['count'] / users['count'].sum() * 100, 2)
+
+        return users.rename(columns={'users': 'User Name', 'count': 'Chat Percentage'})
+
+    def links_by_user(self):
+        """
+        Count the number of links shared by each user in the group.
+
+        Returns:
+            pandas.DataFrame: DataFrame containing the user names and the number of links they shared.
+        """
+        return self.query(
+            'SELECT users AS "User Name", COUNT(*) AS "Links Shared" FROM links '
+            'WHERE {where} GROUP BY users ORDER BY "Links Shared" DESC, MIN(position)'
+        ).astype({'Links Shared': 'int64'})
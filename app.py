@@ -9,22 +9,23 @@ Author: Abhishek Santosh Gupta
 GitHub: github.com/1abhi6
 """
 
+import os
 import streamlit as st
 from abc import ABC, abstractmethod
 
-from preprocessor import Preprocess
+from preprocessor import ChatCache, timing
+from analysis import MessageStore
 from components import (
     Plot,
     SubHeader,
+    PlotWaterfall,
+    CachedAnalyse,
+    chat_key,
+    load_chat,
+    load_store,
     PADDING_TOP
 )
 
-from analysis import (
-    Analyse,
-    UserList,
-    GroupSpecificAnalysis
-)
-
 
 class Sidebar(ABC):
     """
@@ -40,29 +41,89 @@ class Sidebar(ABC):
         Create the sidebar components and functionality.
         """
         upload_file = st.sidebar.file_uploader(
-            'Choose a text file',
-            help='Upload a .txt file of chat without media exported from WhatsApp.'
+            'Choose a chat export',
+            type=['txt', 'zip'],
+            help='Upload a .txt or .zip file of chat exported from WhatsApp.'
         )
 
-        if upload_file is not None:
-            bytes_data = upload_file.getvalue()
-            data = bytes_data.decode('utf-8')
+        compact = st.sidebar.checkbox(
+            'Compact memory mode',
+            help='Store the parsed chat with compact column types, uses about 90% less memory on large chats.'
+        )
+
+        use_store = st.sidebar.checkbox(
+            'Message store',
+            help='Keep the messages in a local SQLite database and run every metric as a query, memory stays flat on archives of any size.'
+        )
+
+        workers = st.sidebar.number_input(
+            'Worker processes',
+            min_value=1,
+            max_value=os.cpu_count() or 1,
+            value=1,
+            help='Split word, emoji and link counting of large chats across processes.'
+        )
+
+        self.show_timings = st.sidebar.checkbox(
+            'Performance panel',
+            help='Time decoding, parsing, every metric and every chart of each rerun.'
+        )
+        timing.enable(self.show_timings)
 
+        chat_cache = ChatCache()
+
+        if upload_file is not None:
             try:
-                preprocessor_obj = Preprocess(data)
-                self.df = preprocessor_obj.text_to_df()
-                self.user_list_obj = UserList(self.df)
-                users_list = self.user_list_obj.user_list()
+                # Parsing and every metric are memoized by the hash of the upload
+                # The message store has no compact schema, keep one stored copy per chat
+                self.chat_key = chat_key(upload_file.id, upload_file, compact and not use_store)
+                if use_store:
+                    load_store(self.chat_key, upload_file)
+                    self.df = None
+                else:
+                    self.df = load_chat(self.chat_key, upload_file, compact)
+                users_list = CachedAnalyse(self.df, self.chat_key, 'Overall', workers).user_list()
 
                 self.selected_user = st.sidebar.selectbox(
                     'Show Analysis', users_list)
-                self.analysis_obj = Analyse(self.df, self.selected_user)
+                self.analysis_obj = CachedAnalyse(
+                    self.df, self.chat_key, self.selected_user, workers)
 
                 self.show_analysis_btn()
 
             except Exception as e:
                 st.sidebar.error(e)
 
+        self.cache_panel(chat_cache)
+
+    def cache_panel(self, chat_cache):
+        """
+        Show the cached chats and a button to clear them.
+        """
+        with st.sidebar.expander('Cached Chats'):
+            st.dataframe(chat_cache.entries())
+            st.dataframe(MessageStore().entries())
+
+            if st.button('Clear Cache'):
+                chat_cache.clear()
+                MessageStore().clear()
+                st.experimental_rerun()
+
+    def performance_panel(self):
+        """
+        Show the time spent in every stage of this rerun as a waterfall.
+        """
+        records = timing.records()
+
+        with st.sidebar.expander('Performance', expanded=True):
+            if records.empty:
+                st.write('Nothing was computed in this rerun.')
+                return
+
+            st.metric(label='Timed Total', value='{:.2f} s'.format(records['seconds'].sum()))
+            PlotWaterfall(records)
+            st.dataframe(records)
+
     @abstractmethod
     def show_analysis_btn(self):
         """
@@ -86,12 +147,19 @@ class Main(Sidebar):
             layout='wide', page_title="Abhi's WhatsApp Analyser", page_icon='📊')
         super().__init__()
 
+        if self.show_timings:
+            self.performance_panel()
+
     def show_analysis_btn(self):
         """
         Override the show_analysis_btn method from the Sidebar class.
         Show the analysis button and trigger the analysis when clicked.
         """
+        # Keep the analysis open while sections are switched
         if st.sidebar.button('Show Chat Analysis'):
+            st.session_state['show_analysis'] = True
+
+        if st.session_state.get('show_analysis'):
 
             if not self.selected_user == 'Overall':
                 col1, col2, col3 = st.columns(3)
@@ -121,44 +189,62 @@ class Main(Sidebar):
                 with col3:
                     st.write()
 
-                self.group_specific_analysis = GroupSpecificAnalysis(
-                    self.df, self.selected_user)
-
-            self.plot = Plot(self.df, self.selected_user)
+            self.plot = Plot(self.analysis_obj)
 
-            st.divider()
-            self.quick_metric()
+            # Only the open section is computed, the others wait for a click
+            sections = {
+                'Timeline': self.timeline_section,
+                'Quick Metrics': self.quick_metric,
+                'Activity': self.activity_section,
+                'Words': self.words_section,
+                'Emojis': self.plot.plot_most_used_emoji,
+                'Links': self.plot.plot_top_domains,
+            }
+            if self.selected_user == 'Overall':
+                sections['Users'] = self.plot_most_active_users
 
             st.divider()
-            self.plot.plot_daily_timeline()
+            section = st.radio(
+                'Section', list(sections), horizontal=True,
+                key='section', label_visibility='collapsed')
 
             st.divider()
-            self.plot.plot_timeline()
+            sections[section]()
 
-            st.divider()
-            self.plot.plot_most_active_day_of_week()
+    def timeline_section(self):
+        """
+        Show the daily and monthly timelines of the chat conversation.
+        """
+        self.plot.plot_daily_timeline()
 
-            st.divider()
-            self.plot.plot_most_active_month()
+        st.divider()
+        self.plot.plot_timeline()
 
-            self.plot_most_active_users()
-            st.divider()
+    def activity_section(self):
+        """
+        Show the most active days, months and hours of the chat conversation.
+        """
+        self.plot.plot_most_active_day_of_week()
 
-            self.plot.plot_word_cloud()
-            st.divider()
+        st.divider()
+        self.plot.plot_most_active_month()
 
-            try:
-                self.plot.plot_most_common_words()
+        st.divider()
+        self.plot.plot_activity_heatmap()
 
-            except Exception:
-                st.write(
-                    'The data you provided has fewer metrics to show more about the selected user.')
+    def words_section(self):
+        """
+        Show the word cloud and the most common words of the chat conversation.
+        """
+        self.plot.plot_word_cloud()
+        st.divider()
 
-            st.divider()
-            self.plot.plot_most_used_emoji()
+        try:
+            self.plot.plot_most_common_words()
 
-            st.divider()
-            self.plot.plot_activity_heatmap()
+        except Exception:
+            st.write(
+                'The data you provided has fewer metrics to show more about the selected user.')
 
     def quick_metric(self):
         """
@@ -192,7 +278,6 @@ class Main(Sidebar):
         Plot the most active users in the chat conversation.
         """
         if self.selected_user == 'Overall':
-            st.divider()
             col1, col2 = st.columns(2)
             with col1:
                 SubHeader(
@@ -200,7 +285,7 @@ class Main(Sidebar):
                     tooltip='Most active user with percentage of chats.'
                 )
 
-                users = self.group_specific_analysis.most_active_users_percentage()
+                users = self.analysis_obj.most_active_users_percentage()
                 st.dataframe(users)
 
             with col2:
@@ -0,0 +1,194 @@
+# -*- coding: utf-8 -*-
+"""
+WhatsApp Chat Analyser - Batch Command Line
+
+This script runs every analysis metric on a directory of WhatsApp chat exports,
+one worker process per chat, and writes the results of each chat as JSON or Parquet.
+It never imports Streamlit or a plotting library, so it can run headless.
+
+Usage:
+    python batch.py exports/ results/ --format parquet --workers 8
+
+Author: Abhishek Santosh Gupta
+GitHub: github.com/1abhi6
+"""
+
+import os
+import sys
+import json
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import pandas as pd
+
+from preprocessor import ChunkedPreprocess, open_chat_export, backend as backends
+from analysis import UserList, GroupSpecificAnalysis
+
+
+# Metrics written for every chat and user
+METRICS = [
+    'num_messages',
+    'total_words',
+    'media_shared',
+    'links_shared',
+    'word_cloud',
+    'most_common_words',
+    'most_used_emojis',
+    'top_domains',
+    'timeline',
+    'daily_timeline',
+    'most_active_day_of_week',
+    'most_active_month',
+    'activity_heatmap',
+    'most_active_users',
+    'most_active_users_percentage',
+    'links_by_user',
+]
+
+# Extensions of the chat exports picked up in the input directory
+EXPORT_EXTENSIONS = ('.txt', '.zip')
+
+
+def to_frame(result):
+    """
+    Convert the result of a metric into a DataFrame.
+
+    Args:
+        result: The result of a metric, a scalar, a dict or a DataFrame.
+
+    Returns:
+        pandas.DataFrame: The result with a default index and string column names.
+    """
+    if isinstance(result, dict):
+        frame = pd.DataFrame(list(result.items()), columns=['Words', 'Frequency'])
+    elif isinstance(result, pd.DataFrame):
+        frame = result.reset_index() if result.index.name is not None else result.reset_index(drop=True)
+    else:
+        frame = pd.DataFrame({'value': [result]})
+
+    frame.columns = [str(column) for column in frame.columns]
+    return frame
+
+
+def analyse_chat(path, output_dir, output_format='json', all_users=False, compact=True,
+                 backend=None):
+    """
+    Parse one chat export, run every metric on it and write the results.
+
+    Args:
+        path (str): Path of the .txt or .zip chat export.
+        output_dir (str): Directory the results are written to.
+        output_format (str, optional): 'json' for one JSON file per chat, 'parquet'
+            for one directory per chat with a Parquet file per metric.
+        all_users (bool, optional): Also analyse every user on their own, not just
+            the whole chat.
+        compact (bool, optional): Parse the chat with the compact schema.
+        backend (str, optional): Dataframe backend, 'pandas' or 'polars'.
+
+    Returns:
+        tuple: Path of the chat export and its number of messages.
+    """
+    with open(path, 'rb') as file:
+        df = ChunkedPreprocess(open_chat_export(file)).text_to_df(
+            compact=compact, backend=backend)
+
+    users = UserList(df).user_list() if all_users else ['Overall']
+    results = {}
+    for user in users:
+        analyse = GroupSpecificAnalysis(df, user, backend=backend)
+        results[user] = {metric: getattr(analyse, metric)() for metric in METRICS}
+
+    # Keep the extension, so chat.txt and chat.zip don't overwrite each other
+    name = os.path.basename(path)
+
+    if output_format == 'json':
+        records = {
+            user: {metric: to_frame(result).to_dict('records')
+                   if isinstance(result, (dict, pd.DataFrame)) else result
+                   for metric, result in metrics.items()}
+            for user, metrics in results.items()
+        }
+        with open(os.path.join(output_dir, name + '.json'), 'w', encoding='utf-8') as f:
+            json.dump(records, f, ensure_ascii=False, default=str)
+
+    else:
+        chat_dir = os.path.join(output_dir, name)
+        os.makedirs(chat_dir, exist_ok=True)
+        for metric in METRICS:
+            frame = pd.concat(
+                [to_frame(metrics[metric]).assign(user=user) for user, metrics in results.items()],
+                ignore_index=True)
+            frame.to_parquet(os.path.join(chat_dir, metric + '.parquet'), index=False)
+
+    return path, len(df)
+
+
+def find_exports(input_dir):
+    """
+    List the chat exports in a directory.
+
+    Args:
+        input_dir (str): Directory holding the chat exports.
+
+    Returns:
+        list: Sorted paths of every .txt and .zip file.
+    """
+    return sorted(
+        os.path.join(input_dir, name) for name in os.listdir(input_dir)
+        if name.lower().endswith(EXPORT_EXTENSIONS))
+
+
+def main(argv=None):
+    """
+    Run the batch analysis from the command line.
+
+    Args:
+        argv (list, optional): Command line arguments, defaults to sys.argv.
+
+    Returns:
+        int: Exit status, 1 if any chat failed.
+    """
+    parser = argparse.ArgumentParser(
+        description='Run every WhatsApp chat analysis metric on a directory of exports.')
+    parser.add_argument('input_dir', help='Directory holding .txt or .zip chat exports.')
+    parser.add_argument('output_dir', help='Directory the results are written to.')
+    parser.add_argument('--format', choices=['json', 'parquet'], default='json',
+                        help='Output format of the results (default: json).')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                        help='Number of chats analysed in parallel (default: every CPU).')
+    parser.add_argument('--all-users', action='store_true',
+                        help='Also analyse every user of a chat on their own.')
+    parser.add_argument('--no-compact', action='store_true',
+                        help='Parse chats with the plain schema instead of the compact one.')
+    parser.add_argument('--backend', choices=backends.BACKENDS,
+                        help='Dataframe backend (default: ${} or pandas).'.format(
+                            backends.BACKEND_ENV))
+    args = parser.parse_args(argv)
+
+    # Fail early on a missing Polars rather than once per chat
+    backends.resolve(args.backend)
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    paths = find_exports(args.input_dir)
+    failed = 0
+
+    with ProcessPoolExecutor(max_workers=max(args.workers, 1)) as pool:
+        futures = {
+            pool.submit(analyse_chat, path, args.output_dir, args.format,
+                        args.all_users, not args.no_compact, args.backend): path
+            for path in paths
+        }
+        for future in as_completed(futures):
+            try:
+                path, num_messages = future.result()
+                print('{}: {} messages'.format(path, num_messages), file=sys.stderr)
+            except Exception as e:
+                failed += 1
+                print('{}: failed, {}'.format(futures[future], e), file=sys.stderr)
+
+    print('Analysed {} of {} chats.'.format(len(paths) - failed, len(paths)), file=sys.stderr)
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,168 @@
+# -*- coding: utf-8 -*-
+"""
+WhatsApp Chat Analyzer - Synthetic Chat Generator
+
+This module generates synthetic WhatsApp chat exports in the Android layout
+`Preprocess` accepts, with configurable size, users and content mix, for benchmarks.
+
+Usage:
+    python -m benchmarks.generator chat.txt --messages 1000000 --users 50
+
+Author: Abhishek Santosh Gupta
+GitHub: github.com/1abhi6
+"""
+
+import argparse
+import datetime
+
+import numpy as np
+
+
+# Words the synthetic messages are made of, English and Hinglish
+VOCABULARY = (
+    'hello hi ok okay yes no haha lol what when where why how time today tomorrow '
+    'kal aaj kya hai haan nahi acha theek bhai yaar chalo milte party game match '
+    'movie dinner lunch office meeting call photo video song trip plan done thanks '
+    'please sorry good night morning see you soon love miss great nice cool sure'
+).split()
+
+# Emojis the synthetic messages use, with skin tones, ZWJ sequences and flags
+EMOJIS = ['😂', '👍', '❤️', '🙏', '😍', '🔥', '😭', '🎉', '👍🏽', '👨‍👩‍👧', '🇮🇳', '😅']
+
+# Domains of the links in the synthetic messages
+DOMAINS = ['youtube.com', 'instagram.com', 'example.com', 'github.com', 'news.example.org']
+
+# Messages WhatsApp leaves in place of media
+MEDIA_MESSAGE = '<Media omitted>'
+
+# First timestamp of a synthetic chat
+START = datetime.datetime(2020, 1, 1)
+
+# Messages generated at a time
+BATCH_SIZE = 100000
+
+# "12:05 am" style clock of every minute of the day
+CLOCK = [
+    '{}:{:02d} {}'.format((minute // 60) % 12 or 12, minute % 60,
+                               'am' if minute < 720 else 'pm')
+    for minute in range(24 * 60)
+]
+
+
+def iter_chat(num_messages, num_users=20, emoji_density=0.2, url_density=0.05,
+              media_density=0.1, multiline_density=0.05, notification_density=0.01,
+              seed=0):
+    """
+    Generate a synthetic chat export in batches of lines.
+
+    Args:
+        num_messages (int): Number of messages in the chat.
+        num_users (int, optional): Number of users sending messages.
+        emoji_density (float, optional): Share of messages with emojis.
+        url_density (float, optional): Share of messages with a link.
+        media_density (float, optional): Share of media placeholder messages.
+        multiline_density (float, optional): Share of messages spanning two lines.
+        notification_density (float, optional): Share of group notifications.
+        seed (int, optional): Seed of the random generator.
+
+    Yields:
+        str: The lines of up to `BATCH_SIZE` messages.
+    """
+    rng = np.random.default_rng(seed)
+
+    # Every fifth user is saved by phone number only
+    users = np.array([
+        '+91 98{:03d} {:05d}'.format(user % 1000, user) if user % 5 == 4 else 'User {}'.format(user)
+        for user in range(num_users)
+    ], dtype=object)
+    vocabulary = np.array(VOCABULARY, dtype=object)
+
+    days = {}
+    minute = 0
+    for start in range(0, num_messages, BATCH_SIZE):
+        size = min(BATCH_SIZE, num_messages - start)
+
+        # Minutes since the start of the chat, a few minutes apart on average
+        minutes = minute + np.cumsum(rng.integers(0, 8, size))
+        minute = int(minutes[-1])
+
+        senders = users[rng.integers(0, num_users, size)]
+        lengths = rng.integers(1, 13, size)
+        words = vocabulary[rng.integers(0, len(vocabulary), lengths.sum())]
+        kind = rng.random((5, size))
+
+        lines = []
+        offset = 0
+        for i in range(size):
+            day, clock = divmod(int(minutes[i]), 24 * 60)
+            if day not in days:
+                days[day] = (START + datetime.timedelta(days=day)).strftime('%d/%m/%y, ')
+
+            text = ' '.join(words[offset:offset + lengths[i]])
+            offset += lengths[i]
+
+            if kind[0, i] < notification_density:
+                lines.append('{}{} - {} added {}\n'.format(
+                    days[day], CLOCK[clock], senders[i], users[(i + 1) % num_users]))
+                continue
+
+            if kind[1, i] < media_density:
+                text = MEDIA_MESSAGE
+            else:
+                if kind[2, i] < url_density:
+                    text += ' https://www.{}/watch?v={}'.format(
+                        DOMAINS[i % len(DOMAINS)], start + i)
+                if kind[3, i] < emoji_density:
+                    text += ' ' + ''.join(EMOJIS[(i + k) % len(EMOJIS)] for k in range(i % 3 + 1))
+                if kind[4, i] < multiline_density:
+                    text += '\n' + text
+
+            lines.append('{}{} - {}: {}\n'.format(days[day], CLOCK[clock], senders[i], text))
+
+        yield ''.join(lines)
+
+
+def generate_chat(num_messages, **kwargs):
+    """
+    Generate a synthetic chat export as one string.
+
+    Args:
+        num_messages (int): Number of messages in the chat.
+        **kwargs: Content options of `iter_chat`.
+
+    Returns:
+        str: The chat export.
+    """
+    return ''.join(iter_chat(num_messages, **kwargs))
+
+
+def write_chat(path, num_messages, **kwargs):
+    """
+    Write a synthetic chat export to a file, one batch at a time.
+
+    Args:
+        path (str): Path of the chat export.
+        num_messages (int): Number of messages in the chat.
+        **kwargs: Content options of `iter_chat`.
+    """
+    with open(path, 'w', encoding='utf-8') as f:
+        for lines in iter_chat(num_messages, **kwargs):
+            f.write(lines)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Generate a synthetic WhatsApp chat export.')
+    parser.add_argument('path', help='Path of the chat export to write.')
+    parser.add_argument('--messages', type=int, default=100000, help='Number of messages.')
+    parser.add_argument('--users', type=int, default=20, help='Number of users.')
+    parser.add_argument('--emoji-density', type=float, default=0.2)
+    parser.add_argument('--url-density', type=float, default=0.05)
+    parser.add_argument('--media-density', type=float, default=0.1)
+    parser.add_argument('--multiline-density', type=float, default=0.05)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    write_chat(args.path, args.messages, num_users=args.users,
+               emoji_density=args.emoji_density, url_density=args.url_density,
+               media_density=args.media_density, multiline_density=args.multiline_density,
+               seed=args.seed)
@@ -0,0 +1,129 @@
+# -*- coding: utf-8 -*-
+"""
+WhatsApp Chat Analyzer - Backend Parity Check
+
+This script parses chats and runs every analysis metric for every user with
+the pandas and the polars backend, in both schemas, and reports every result
+that differs between the two, along with the time each backend took.
+
+Usage:
+    python -m benchmarks.parity --sizes 10000 100000
+    python -m benchmarks.parity --chats exports/chat.txt
+
+Author: Abhishek Santosh Gupta
+GitHub: github.com/1abhi6
+"""
+
+import sys
+import time
+import argparse
+
+import pandas as pd
+
+from preprocessor import Preprocess
+from analysis import UserList, GroupSpecificAnalysis
+from batch import METRICS
+
+from .generator import generate_chat
+
+
+# Synthetic chat sizes checked by default
+SIZES = [10000]
+
+
+def analyse(data, backend, compact=False):
+    """
+    Parse a chat and run every metric for every user with one backend.
+
+    Args:
+        data (str): The chat export text.
+        backend (str): 'pandas' or 'polars'.
+        compact (bool, optional): Parse the chat with the compact schema.
+
+    Returns:
+        tuple: Result of the parser and of every user and metric, and the seconds taken.
+    """
+    start = time.perf_counter()
+    df = Preprocess(data).text_to_df(compact=compact, backend=backend)
+
+    results = {'text_to_df': df}
+    for user in UserList(df).user_list():
+        analysis = GroupSpecificAnalysis(df, user, backend=backend)
+        for metric in METRICS:
+            results[(user, metric)] = getattr(analysis, metric)()
+
+    return results, time.perf_counter() - start
+
+
+def compare(expected, actual):
+    """
+    Compare the results of two backends.
+
+    Args:
+        expected (dict): Results of the pandas backend.
+        actual (dict): Results of the polars backend.
+
+    Returns:
+        list: One message per result that differs.
+    """
+    mismatches = []
+    for name, result in expected.items():
+        other = actual.get(name)
+        try:
+            if isinstance(result, pd.DataFrame):
+                pd.testing.assert_frame_equal(result, other)
+            elif isinstance(result, pd.Series):
+                pd.testing.assert_series_equal(result, other)
+            else:
+                assert result == other, '{!r} != {!r}'.format(result, other)
+        except AssertionError as error:
+            mismatches.append('{}: {}'.format(name, str(error).strip().splitlines()[0]))
+
+    return mismatches
+
+
+def main(argv=None):
+    """
+    Run the parity check from the command line.
+
+    Args:
+        argv (list, optional): Command line arguments, defaults to sys.argv.
+
+    Returns:
+        int: Exit status, 1 if any result differs between the backends.
+    """
+    parser = argparse.ArgumentParser(description='Check the polars backend against pandas.')
+    parser.add_argument('--sizes', type=int, nargs='*', default=SIZES,
+                        help='Number of messages of every synthetic chat.')
+    parser.add_argument('--chats', nargs='*', default=[],
+                        help='Paths of chat exports to check as well.')
+    args = parser.parse_args(argv)
+
+    chats = [('{} messages'.format(size), generate_chat(size)) for size in args.sizes]
+    for path in args.chats:
+        with open(path, 'r', encoding='utf-8') as f:
+            chats.append((path, f.read()))
+
+    mismatches = []
+    for name, data in chats:
+        for compact in (False, True):
+            expected, pandas_seconds = analyse(data, 'pandas', compact)
+            actual, polars_seconds = analyse(data, 'polars', compact)
+
+            found = compare(expected, actual)
+            for mismatch in found:
+                mismatches.append('{}{}, {}'.format(
+                    name, ' (compact)' if compact else '', mismatch))
+
+            print('{:<30} compact={!s:<5} pandas {:8.3f} s  polars {:8.3f} s  {} mismatches'.format(
+                name, compact, pandas_seconds, polars_seconds, len(found)), file=sys.stderr)
+
+    for mismatch in mismatches:
+        print('MISMATCH ' + mismatch, file=sys.stderr)
+
+    print('{} mismatches.'.format(len(mismatches)), file=sys.stderr)
+    return 1 if mismatches else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
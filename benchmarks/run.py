@@ -0,0 +1,197 @@
+# -*- coding: utf-8 -*-
+"""
+WhatsApp Chat Analyzer - Benchmark Suite
+
+This script times and memory-profiles the parser and every analysis metric on
+synthetic chats of several sizes, compares the results against stored baselines
+and flags regressions.
+
+Usage:
+    python -m benchmarks.run --sizes 10000 100000
+    python -m benchmarks.run --sizes 10000 100000 --save-baseline
+
+Author: Abhishek Santosh Gupta
+GitHub: github.com/1abhi6
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import tracemalloc
+
+from preprocessor import Preprocess
+from preprocessor import backend as backends
+from analysis import GroupSpecificAnalysis
+from batch import METRICS
+
+from .generator import generate_chat
+
+
+# Baselines the results are compared against
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), 'baselines.json')
+
+# Chat sizes benchmarked by default, pass up to 10,000,000 with --sizes
+SIZES = [10000, 100000]
+
+# Relative slowdown or memory growth over the baseline flagged as a regression
+TOLERANCE = 0.25
+
+# Stages faster than this are not flagged, their timings are mostly noise
+MIN_SECONDS = 0.25
+
+# Memory growth below this many MiB is not flagged, small stages barely allocate
+MIN_MIB = 1
+
+
+def measure(func, memory=True):
+    """
+    Time a function, and trace its peak memory in a second run.
+
+    Args:
+        func (function): Function to benchmark, called without arguments.
+        memory (bool, optional): Also trace the peak memory.
+
+    Returns:
+        tuple: The result of the function and its seconds and peak MiB.
+    """
+    start = time.perf_counter()
+    result = func()
+    seconds = time.perf_counter() - start
+
+    peak_mib = None
+    if memory:
+        tracemalloc.start()
+        func()
+        peak_mib = tracemalloc.get_traced_memory()[1] / 1024 / 1024
+        tracemalloc.stop()
+
+    return result, {'seconds': round(seconds, 4),
+                    'peak_mib': round(peak_mib, 2) if peak_mib is not None else None}
+
+
+def run(sizes=SIZES, memory=True, backend=None):
+    """
+    Benchmark the parser and every metric on a synthetic chat of each size.
+
+    Args:
+        sizes (list, optional): Number of messages of every chat.
+        memory (bool, optional): Also trace the peak memory of every stage.
+        backend (str, optional): Dataframe backend, 'pandas' or 'polars'.
+
+    Returns:
+        dict: Seconds and peak MiB of every stage, by chat size.
+    """
+    results = {}
+    for size in sizes:
+        data = generate_chat(size)
+        stages = {}
+
+        df, stages['text_to_df'] = measure(
+            lambda: Preprocess(data).text_to_df(backend=backend), memory)
+        _, stages['text_to_df(compact)'] = measure(
+            lambda: Preprocess(data).text_to_df(compact=True, backend=backend), memory)
+
+        # Every metric on a fresh GroupSpecificAnalysis
+        for metric in METRICS:
+            _, stages[metric] = measure(
+                lambda: getattr(GroupSpecificAnalysis(df, 'Overall', backend=backend), metric)(),
+                memory)
+
+        for stage, result in stages.items():
+            print('{:>10} {:<30} {:>9.3f} s {:>9} MiB'.format(
+                size, stage, result['seconds'], str(result['peak_mib'])), file=sys.stderr)
+
+        results[str(size)] = stages
+
+    return results
+
+
+def compare(results, baselines, tolerance=TOLERANCE):
+    """
+    Compare benchmark results against the baselines.
+
+    Args:
+        results (dict): Results of `run()`.
+        baselines (dict): Stored results of an earlier `run()`.
+        tolerance (float, optional): Relative growth flagged as a regression.
+
+    Returns:
+        list: One message per regression. Stages without a baseline are
+            reported on stderr and skipped.
+    """
+    regressions = []
+    for size, stages in results.items():
+        for stage, result in stages.items():
+            baseline = baselines.get(size, {}).get(stage)
+            if baseline is None:
+                print('NO BASELINE {} messages, {}'.format(size, stage), file=sys.stderr)
+                continue
+
+            if (result['seconds'] > MIN_SECONDS and
+                    result['seconds'] > baseline['seconds'] * (1 + tolerance)):
+                regressions.append('{} messages, {}: {:.3f} s, baseline {:.3f} s'.format(
+                    size, stage, result['seconds'], baseline['seconds']))
+
+            if (result['peak_mib'] is not None and baseline['peak_mib'] is not None and
+                    result['peak_mib'] - baseline['peak_mib'] > MIN_MIB and
+                    result['peak_mib'] > baseline['peak_mib'] * (1 + tolerance)):
+                regressions.append('{} messages, {}: {:.1f} MiB, baseline {:.1f} MiB'.format(
+                    size, stage, result['peak_mib'], baseline['peak_mib']))
+
+    return regressions
+
+
+def main(argv=None):
+    """
+    Run the benchmark suite from the command line.
+
+    Args:
+        argv (list, optional): Command line arguments, defaults to sys.argv.
+
+    Returns:
+        int: Exit status, 1 if any regression was flagged.
+    """
+    parser = argparse.ArgumentParser(description='Benchmark the parser and analysis metrics.')
+    parser.add_argument('--sizes', type=int, nargs='+', default=SIZES,
+                        help='Number of messages of every synthetic chat.')
+    parser.add_argument('--no-memory', action='store_true',
+                        help='Skip the traced run measuring peak memory.')
+    parser.add_argument('--tolerance', type=float, default=TOLERANCE,
+                        help='Relative growth flagged as a regression (default: 0.25).')
+    parser.add_argument('--save-baseline', action='store_true',
+                        help='Store the results as the new baselines.')
+    parser.add_argument('--backend', choices=backends.BACKENDS,
+                        help='Dataframe backend benchmarked (default: pandas).')
+    parser.add_argument('--output', help='Also write the results to this JSON file.')
+    args = parser.parse_args(argv)
+
+    results = run(args.sizes, memory=not args.no_memory, backend=args.backend)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+
+    baselines = {}
+    if os.path.exists(BASELINE_PATH):
+        with open(BASELINE_PATH, 'r', encoding='utf-8') as f:
+            baselines = json.load(f)
+
+    if args.save_baseline:
+        baselines.update(results)
+        with open(BASELINE_PATH, 'w', encoding='utf-8') as f:
+            json.dump(baselines, f, indent=2)
+        print('Saved baselines to {}.'.format(BASELINE_PATH), file=sys.stderr)
+        return 0
+
+    regressions = compare(results, baselines, args.tolerance)
+    for regression in regressions:
+        print('REGRESSION ' + regression, file=sys.stderr)
+
+    print('{} regressions.'.format(len(regressions)), file=sys.stderr)
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
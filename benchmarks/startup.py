@@ -0,0 +1,136 @@
+# -*- coding: utf-8 -*-
+"""
+WhatsApp Chat Analyzer - Startup Benchmark
+
+This script measures the import time of the app and of every module it may
+load, each in a fresh interpreter, and lists the heavy libraries the app
+loads before any chat is uploaded, on top of those Streamlit loads itself.
+
+Usage:
+    python -m benchmarks.startup --repeat 5
+
+Author: Abhishek Santosh Gupta
+GitHub: github.com/1abhi6
+"""
+
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+
+
+# Modules timed, the project packages first, then their dependencies
+MODULES = [
+    'app',
+    'components',
+    'analysis',
+    'preprocessor',
+    'streamlit',
+    'pandas',
+    'numpy',
+    'pyarrow',
+    'plotly.express',
+    'plotly.graph_objects',
+    'matplotlib.pyplot',
+    'seaborn',
+    'wordcloud',
+    'emoji',
+    'urlextract',
+]
+
+# Libraries that should only load once a chat is analysed
+HEAVY_MODULES = [
+    'plotly.express',
+    'matplotlib.pyplot',
+    'seaborn',
+    'wordcloud',
+    'emoji',
+    'urlextract',
+]
+
+# Imports a module in a fresh interpreter and prints its import time
+TIMER = '''
+import time
+start = time.perf_counter()
+import {module}
+print(time.perf_counter() - start)
+'''
+
+# Imports the app and prints which heavy libraries it loaded, Streamlit
+# already imports matplotlib and the plotly theme on its own
+LOADED = '''
+import sys, json
+import streamlit
+before = set(sys.modules)
+import app
+print(json.dumps([module for module in {modules!r}
+                  if module in sys.modules and module not in before]))
+'''
+
+
+def import_time(module, repeat=3):
+    """
+    Measure the time to import a module in a fresh interpreter.
+
+    Args:
+        module (str): Name of the module.
+        repeat (int, optional): Number of fresh interpreters, the median is kept.
+
+    Returns:
+        float or None: Median seconds to import the module, None if it is not installed.
+    """
+    times = []
+    for _ in range(repeat):
+        result = subprocess.run(
+            [sys.executable, '-c', TIMER.format(module=module)],
+            capture_output=True, text=True)
+        if result.returncode != 0:
+            return None
+        times.append(float(result.stdout.strip().splitlines()[-1]))
+
+    return statistics.median(times)
+
+
+def loaded_at_startup():
+    """
+    List the heavy libraries loaded by importing the app, not by Streamlit.
+
+    Returns:
+        list: Names from `HEAVY_MODULES` first loaded by `import app`.
+    """
+    result = subprocess.run(
+        [sys.executable, '-c', LOADED.format(modules=HEAVY_MODULES)],
+        capture_output=True, text=True, check=True)
+
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main(argv=None):
+    """
+    Run the startup benchmark from the command line.
+
+    Args:
+        argv (list, optional): Command line arguments, defaults to sys.argv.
+
+    Returns:
+        int: Exit status, 1 if the app loads a heavy library at startup.
+    """
+    parser = argparse.ArgumentParser(description='Measure the import time of every module.')
+    parser.add_argument('--repeat', type=int, default=3,
+                        help='Number of fresh interpreters per module (default: 3).')
+    args = parser.parse_args(argv)
+
+    for module in MODULES:
+        seconds = import_time(module, args.repeat)
+        print('{:<24} {}'.format(
+            module, 'not installed' if seconds is None else '{:8.3f} s'.format(seconds)))
+
+    loaded = loaded_at_startup()
+    print('Heavy libraries loaded at startup: {}'.format(', '.join(loaded) or 'none'))
+
+    return 1 if loaded else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,3 +1,8 @@
 from .plot import Plot
 from .utils import SubHeader
+from .utils import PlotWaterfall
 from .style.style import PADDING_TOP
+from .cache import CachedAnalyse
+from .cache import chat_key
+from .cache import load_chat
+from .cache import load_store
@@ -0,0 +1,258 @@
+# -*- coding: utf-8 -*-
+"""
+WhatsApp Chat Analyzer - Streamlit Caching
+
+This module memoizes the parsed chat and every analysis metric across Streamlit reruns,
+so interacting with a widget only recomputes what actually changed.
+
+Author: Abhishek Santosh Gupta
+GitHub: github.com/1abhi6
+"""
+
+import streamlit as st
+
+from preprocessor import ChunkedPreprocess, ChatCache, open_chat_export, timing
+from analysis import (ActivityCube, TokenIndex, LinkIndex, GroupSpecificAnalysis,
+                      MessageStore, StoreAnalyse)
+
+
+@st.cache_data(show_spinner=False, max_entries=64)
+def chat_key(upload_id, _upload_file, compact):
+    """
+    Hash an uploaded export once per upload.
+
+    Args:
+        upload_id (int): The Streamlit id of the uploaded file.
+        _upload_file (UploadedFile): The uploaded file, not hashed by Streamlit.
+        compact (bool): Whether the chat is parsed with the compact schema.
+
+    Returns:
+        str: The cache key of the chat.
+    """
+    return ChatCache().key(_upload_file, compact)
+
+
+@st.cache_resource(show_spinner=False, max_entries=8)
+def load_chat(key, _upload_file, compact):
+    """
+    Load the parsed chat from the disk cache, or parse and cache it. An export
+    continuing a cached chat only has its new messages parsed.
+
+    Args:
+        key (str): The cache key of the chat.
+        _upload_file (UploadedFile): The uploaded file, not hashed by Streamlit.
+        compact (bool): Whether the chat is parsed with the compact schema.
+
+    Returns:
+        pandas.DataFrame: The parsed chat, shared by every session.
+    """
+    chat_cache = ChatCache()
+    with timing.stage('cache read'):
+        df = chat_cache.get(key, compact)
+
+    if df is None:
+        extended = chat_cache.extend(open_chat_export(_upload_file), compact)
+
+        if extended is not None:
+            df, base = extended
+        else:
+            # Decode and parse the upload in blocks to bound peak memory
+            df = ChunkedPreprocess(open_chat_export(_upload_file)).text_to_df(compact=compact)
+            base = None
+
+        chat_cache.put(key, df, compact, base)
+
+    return df
+
+
+def load_store(key, upload_file):
+    """
+    Load a chat into the message store unless it is stored already. The export
+    is parsed and stored one block at a time, so the chat is never held in
+    memory as a whole.
+
+    Args:
+        key (str): The cache key of the chat.
+        upload_file (UploadedFile): The uploaded file.
+
+    Returns:
+        MessageStore: The store holding the chat, shared by every session.
+    """
+    store = MessageStore()
+    if store.chat_id(key) is None:
+        with timing.stage('store ingest'):
+            store.put(key, ChunkedPreprocess(open_chat_export(upload_file)).iter_frames())
+
+    return store
+
+
+def base_chat(key):
+    """
+    Look up the cached chat a chat was extended from.
+
+    Args:
+        key (str): The cache key of the chat.
+
+    Returns:
+        tuple or None: Key and number of messages of the base chat, None if
+        the chat was parsed in full.
+    """
+    manifest = ChatCache().manifest(key)
+    return tuple(manifest['extends']) if manifest and manifest.get('extends') else None
+
+
+@st.cache_resource(show_spinner=False, max_entries=8)
+def load_cube(key, _df):
+    """
+    Aggregate the message counts of a chat once, merging the counts of the
+    chat it extends with those of the new messages.
+
+    Args:
+        key (str): The cache key of the chat.
+        _df (pandas.DataFrame): The parsed chat, not hashed by Streamlit.
+
+    Returns:
+        ActivityCube: The message counts of every user, shared by every session.
+    """
+    base = base_chat(key)
+    if base is not None:
+        base_key, rows = base
+        return load_cube(base_key, _df.iloc[:rows]).merge(ActivityCube(_df.iloc[rows:]))
+
+    return ActivityCube(_df)
+
+
+@st.cache_resource(show_spinner=False, max_entries=8)
+def load_tokens(key, _df, _workers=1):
+    """
+    Tokenize the messages of a chat once, merging the counts of the chat it
+    extends with those of the new messages.
+
+    Args:
+        key (str): The cache key of the chat.
+        _df (pandas.DataFrame): The parsed chat, not hashed by Streamlit.
+        _workers (int, optional): Number of worker processes, not hashed as the
+            result does not depend on it.
+
+    Returns:
+        TokenIndex: The token counts of every user, shared by every session.
+    """
+    base = base_chat(key)
+    if base is not None:
+        base_key, rows = base
+        return load_tokens(base_key, _df.iloc[:rows], _workers).merge(
+            TokenIndex(_df.iloc[rows:], _workers))
+
+    return TokenIndex(_df, _workers)
+
+
+@st.cache_resource(show_spinner=False, max_entries=8)
+def load_links(key, _df, _workers=1):
+    """
+    Extract the links of a chat once, merging the links of the chat it
+    extends with those of the new messages.
+
+    Args:
+        key (str): The cache key of the chat.
+        _df (pandas.DataFrame): The parsed chat, not hashed by Streamlit.
+        _workers (int, optional): Number of worker processes, not hashed as the
+            result does not depend on it.
+
+    Returns:
+        LinkIndex: The links of every user, shared by every session.
+    """
+    base = base_chat(key)
+    if base is not None:
+        base_key, rows = base
+        return load_links(base_key, _df.iloc[:rows], _workers).merge(
+            LinkIndex(_df.iloc[rows:], _workers))
+
+    return LinkIndex(_df, _workers)
+
+
+@st.cache_resource(show_spinner=False, max_entries=64)
+def load_analysis(key, selected_user, _df, workers=1, store=False):
+    """
+    Build the analysis of a chat for the selected user.
+
+    Args:
+        key (str): The cache key of the chat.
+        selected_user (str): The selected user for analysis.
+        _df (pandas.DataFrame): The parsed chat, not hashed by Streamlit.
+        workers (int, optional): Number of worker processes of the text metrics,
+            hashed so a new setting applies to the metrics computed after it.
+        store (bool, optional): Run the metrics as queries on the message store.
+
+    Returns:
+        GroupSpecificAnalysis or StoreAnalyse: The analysis of the selected user.
+    """
+    if store:
+        return StoreAnalyse(MessageStore(), key, selected_user)
+
+    # The indexes are loaded when a metric first needs them, so the user list
+    # and the timeline never wait on tokenizing or link extraction
+    return GroupSpecificAnalysis(
+        _df, selected_user, cube=lambda: load_cube(key, _df),
+        tokens=lambda: load_tokens(key, _df, workers),
+        links=lambda: load_links(key, _df, workers), workers=workers)
+
+
+@st.cache_data(show_spinner=False, max_entries=1024)
+def compute_metric(key, selected_user, metric, _df, _workers=1, store=False):
+    """
+    Compute one analysis metric of a chat for the selected user.
+
+    Args:
+        key (str): The cache key of the chat.
+        selected_user (str): The selected user for analysis.
+        metric (str): The name of the GroupSpecificAnalysis method.
+        _df (pandas.DataFrame): The parsed chat, not hashed by Streamlit.
+        _workers (int, optional): Number of worker processes of the text metrics.
+        store (bool, optional): Run the metric as a query on the message store.
+
+    Returns:
+        The result of the metric.
+    """
+    return getattr(load_analysis(key, selected_user, _df, _workers, store), metric)()
+
+
+class CachedAnalyse:
+    """
+    Class exposing the GroupSpecificAnalysis metrics, memoized by chat, user and metric.
+    """
+
+    def __init__(self, df, key, selected_user, workers=1):
+        """
+        Initialize the CachedAnalyse class.
+
+        Args:
+            df (pandas.DataFrame): The chat data as a DataFrame, None to run the
+                metrics on the message store.
+            key (str): The cache key of the chat.
+            selected_user (str): The selected user for analysis.
+            workers (int, optional): Number of worker processes of the text metrics.
+        """
+        self.df = df
+        self.key = key
+        self.selected_user = selected_user
+        self.workers = workers
+
+    def __getattr__(self, metric):
+        """
+        Look up a GroupSpecificAnalysis metric as a memoized method.
+
+        Args:
+            metric (str): The name of the GroupSpecificAnalysis method.
+
+        Returns:
+            function: Method returning the cached result of the metric.
+        """
+        if metric.startswith('_') or not callable(getattr(GroupSpecificAnalysis, metric, None)):
+            raise AttributeError(metric)
+
+        def cached_metric():
+            with timing.stage('metric:' + metric):
+                return compute_metric(self.key, self.selected_user, metric, self.df,
+                                      self.workers, self.df is None)
+
+        return cached_metric
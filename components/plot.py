@@ -9,12 +9,45 @@ GitHub: github.com/1abhi6
 """
 
 import streamlit as st
-from wordcloud import WordCloud
-import matplotlib.pyplot as plt
-import seaborn as sns
 
-from .utils import SubHeader, PlotBarChart, PlotLineChart
-from analysis import Analyse, GroupSpecificAnalysis
+from preprocessor import timing
+
+from .utils import SubHeader, PlotBarChart, PlotLineChart, PlotHeatMap, min_max_downsample
+
+
+# Largest number of days drawn in the daily timeline, longer ranges are downsampled
+DAILY_TIMELINE_POINTS = 2000
+
+# Number of points above which line charts are drawn with WebGL
+WEBGL_THRESHOLD = 1000
+
+# Size in pixels of the word cloud image
+WORD_CLOUD_WIDTH = 800
+WORD_CLOUD_HEIGHT = 400
+
+
+@st.cache_data(show_spinner=False, max_entries=64)
+def word_cloud_image(frequencies):
+    """
+    Lay out the word cloud of the given word frequencies once.
+
+    The frequencies are the memoized, bounded word_cloud metric of a chat
+    and user, so they hash quickly and identify the image.
+
+    Args:
+        frequencies (dict): Frequency of every word.
+
+    Returns:
+        numpy.ndarray: The word cloud as an RGB image.
+    """
+    # Imported on first use, loading it slows down the app start
+    from wordcloud import WordCloud
+
+    wordcloud = WordCloud(width=WORD_CLOUD_WIDTH, height=WORD_CLOUD_HEIGHT,
+                          background_color='white', colormap='tab20c',
+                          max_font_size=100, max_words=len(frequencies))
+
+    return wordcloud.generate_from_frequencies(frequencies).to_array()
 
 
 class Plot:
@@ -22,18 +55,15 @@ class Plot:
     Class for generating plots of WhatsApp chat analysis results.
     """
 
-    def __init__(self, df, selected_user):
+    def __init__(self, analyse):
         """
         Initialize the Plot class.
 
         Args:
-            df (pandas.DataFrame): The chat data as a DataFrame.
-            selected_user (str): The selected user for analysis.
+            analyse (GroupSpecificAnalysis or CachedAnalyse): The analysis of the selected user.
         """
-        self.df = df
-        self.selected_user = selected_user
-        self.group_specific_analysis = GroupSpecificAnalysis(self.df, self.selected_user)
-        self.analyse = Analyse(self.df, self.selected_user)
+        self.analyse = analyse
+        self.selected_user = analyse.selected_user
 
     def plot_daily_timeline(self):
         """
@@ -46,11 +76,27 @@ class Plot:
             tooltip='Chat timeline over the date.'
         )
 
+        # Long chats get a range slider, narrowing it brings back every day
+        if len(daily_timeline) > DAILY_TIMELINE_POINTS:
+            dates = daily_timeline['Time (Date)']
+            start, end = st.slider(
+                'Date range',
+                min_value=dates.iloc[0],
+                max_value=dates.iloc[-1],
+                value=(dates.iloc[0], dates.iloc[-1]),
+                key='daily_timeline_range_{}'.format(self.selected_user)
+            )
+            daily_timeline = daily_timeline[(dates >= start) & (dates <= end)]
+
+        keep = min_max_downsample(
+            daily_timeline['Number of Messages'].to_numpy(), DAILY_TIMELINE_POINTS)
+
         PlotLineChart(
-            temp_df=daily_timeline,
+            temp_df=daily_timeline.iloc[keep],
             x_axis='Time (Date)',
             y_axis='Number of Messages',
-            layout_title='Conversation History'
+            layout_title='Conversation History',
+            webgl=len(keep) > WEBGL_THRESHOLD
         )
 
     def plot_timeline(self):
@@ -75,7 +121,7 @@ class Plot:
         """
         Plot the bar chart of the most active users.
         """
-        users = self.group_specific_analysis.most_active_users()
+        users = self.analyse.most_active_users()
 
         PlotBarChart(
             x_axis=users['User Name'],
@@ -90,21 +136,22 @@ class Plot:
         """
         Generate and plot the word cloud of frequently used words.
         """
-        text = self.analyse.word_cloud()
+        frequencies = self.analyse.word_cloud()
 
         SubHeader(
             subheader='Frequently Used Words',
             tooltip='Word cloud of frequently used words.'
         )
 
-        wordcloud = WordCloud(background_color='white', colormap='tab20c',
-                              max_font_size=50, max_words=100).generate(text)
+        if not frequencies:
+            st.write('There are no words to show for the selected user.')
+            return
 
-        plt.figure(figsize=(10, 5))
-        plt.imshow(wordcloud, interpolation='bilinear')
-        plt.axis('off')
+        with timing.stage('build:Word Cloud'):
+            image = word_cloud_image(frequencies)
 
-        st.pyplot(plt)
+        with timing.stage('render:Word Cloud'):
+            st.image(image, use_column_width=True)
 
     def plot_most_common_words(self):
         """
@@ -146,6 +193,26 @@ class Plot:
             orientation='h'
         )
 
+    def plot_top_domains(self):
+        """
+        Plot the bar chart of the most shared domains in the chat.
+        """
+        top_domains = self.analyse.top_domains()
+
+        SubHeader(
+            subheader='Most Shared Domains during Chat',
+            tooltip='Bar chart of the websites linked most often in chat.'
+        )
+
+        PlotBarChart(
+            x_axis=top_domains['Links'],
+            y_axis=top_domains['Domain'],
+            layout_title='Most Shared Domains',
+            layout_x_axis='Links',
+            layout_y_axis='Domain',
+            orientation='h'
+        )
+
     def plot_most_active_day_of_week(self):
         """
         Plot the bar chart of the most active day of the week.
@@ -197,9 +264,9 @@ class Plot:
             tooltip='This heatmap shows at which hour of which day users are active.'
         )
 
-        fig, ax = plt.subplots(figsize=(20, 10))
-        sns.heatmap(pivot_table, ax=ax)
-        ax.set_xlabel('Hour')
-        ax.set_ylabel('Day of the Week')
-
-        st.pyplot(fig)
+        PlotHeatMap(
+            pivot_table=pivot_table,
+            x_axis='Hour',
+            y_axis='Day of the Week',
+            layout_title='Activity Heatmap'
+        )
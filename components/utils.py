@@ -3,15 +3,46 @@
 WhatsApp Chat Analyzer
 
 This script provides classes for analyzing and visualizing WhatsApp chat data in a Streamlit app.
+Plotly is imported when the first chart is built, not at startup.
 
 Author: Abhishek Santosh Gupta
 GitHub: github.com/1abhi6
 """
 
 import streamlit as st
+import numpy as np
 import pandas as pd
-import plotly.express as px
-import plotly.graph_objects as go
+
+from preprocessor import timing
+
+
+def min_max_downsample(values: np.ndarray, max_points: int) -> np.ndarray:
+    """
+    Pick at most `max_points` points of a series, keeping the lowest and highest
+    point of every bucket so no peak or dip is lost.
+
+    Args:
+        values (np.ndarray): The y values of the series, in x order.
+        max_points (int): The largest number of points kept.
+
+    Returns:
+        np.ndarray: Sorted positions of the kept points, always including the
+        first and last point.
+    """
+    size = len(values)
+    if size <= max_points:
+        return np.arange(size)
+
+    # Equal-width buckets of consecutive points, two points kept per bucket
+    buckets = max(max_points // 2 - 1, 1)
+    bucket = np.arange(size) * buckets // size
+    order = np.lexsort((values, bucket))
+
+    starts = np.searchsorted(bucket, np.arange(buckets))
+    ends = np.append(starts[1:], size)
+
+    keep = np.concatenate([order[starts], order[ends - 1], [0, size - 1]])
+    return np.unique(keep)
 
 
 class SubHeader:
@@ -63,26 +94,31 @@ class PlotBarChart:
                   'rgba(255, 165, 0, 0.6)', 'rgba(128, 0, 128, 0.6)', 'rgba(0, 128, 0, 0.8)',
                   'rgba(255, 255, 0, 0.9)', 'rgba(255, 0, 255, 0.9)', 'rgba(0, 128, 128, 0.9)',]
 
-        fig = go.Figure(data=go.Bar(
-            x=x_axis,
-            y=y_axis,
-            orientation=orientation,
-            marker=dict(color=colors)
-        ))
+        with timing.stage('build:' + layout_title):
+            import plotly.graph_objects as go
 
-        fig.update_layout(
-            title=layout_title,
-            xaxis=dict(title=layout_x_axis),
-            yaxis=dict(title=layout_y_axis)
-        )
+            fig = go.Figure(data=go.Bar(
+                x=x_axis,
+                y=y_axis,
+                orientation=orientation,
+                marker=dict(color=colors)
+            ))
 
-        st.plotly_chart(fig, use_container_width=True)
+            fig.update_layout(
+                title=layout_title,
+                xaxis=dict(title=layout_x_axis),
+                yaxis=dict(title=layout_y_axis)
+            )
+
+        with timing.stage('render:' + layout_title):
+            st.plotly_chart(fig, use_container_width=True)
 
 
 class PlotLineChart:
     """Class to plot a line chart."""
 
-    def __init__(self, temp_df: pd.DataFrame, x_axis: str, y_axis: str, layout_title: str) -> None:
+    def __init__(self, temp_df: pd.DataFrame, x_axis: str, y_axis: str, layout_title: str,
+                 webgl: bool = False) -> None:
         """
         Initialize the PlotLineChart class.
 
@@ -91,12 +127,48 @@ class PlotLineChart:
             x_axis (str): The column name for the x-axis.
             y_axis (str): The column name for the y-axis.
             layout_title (str): The title of the chart.
+            webgl (bool, optional): Draw the line with WebGL, for many points.
+        """
+        with timing.stage('build:' + layout_title):
+            import plotly.express as px
+
+            fig = px.line(
+                temp_df,
+                x=x_axis,
+                y=y_axis,
+                title=layout_title,
+                render_mode='webgl' if webgl else 'auto'
+            )
+
+        with timing.stage('render:' + layout_title):
+            st.plotly_chart(fig, use_container_width=True)
+
+
+class PlotWaterfall:
+    """Class to plot the timed stages of a rerun as a waterfall."""
+
+    def __init__(self, records: pd.DataFrame) -> None:
         """
-        fig = px.line(
-            temp_df,
-            x=x_axis,
-            y=y_axis,
-            title=layout_title
+        Initialize the PlotWaterfall class.
+
+        Args:
+            records (pd.DataFrame): Stage, start offset and seconds of every timed stage.
+        """
+        import plotly.graph_objects as go
+
+        fig = go.Figure(data=go.Bar(
+            x=records['seconds'],
+            y=records['stage'],
+            base=records['start'],
+            orientation='h',
+            marker=dict(color='rgba(0, 0, 255, 0.6)')
+        ))
+
+        fig.update_layout(
+            xaxis=dict(title='Seconds since the rerun started'),
+            yaxis=dict(autorange='reversed'),
+            height=max(300, 20 * len(records)),
+            margin=dict(l=0, r=0, t=0, b=0)
         )
 
         st.plotly_chart(fig, use_container_width=True)
@@ -105,7 +177,7 @@ class PlotLineChart:
 class PlotHeatMap:
     """Class to plot a heat map."""
 
-    def __init__(self, pivot_table: pd.DataFrame, x_axis: str, y_axis: str) -> None:
+    def __init__(self, pivot_table: pd.DataFrame, x_axis: str, y_axis: str, layout_title: str) -> None:
         """
         Initialize the PlotHeatMap class.
 
@@ -113,19 +185,25 @@ class PlotHeatMap:
             pivot_table (pd.DataFrame): The pivot table data for the heat map.
             x_axis (str): The label for the x-axis.
             y_axis (str): The label for the y-axis.
+            layout_title (str): The title of the chart.
         """
-        heatmap = go.Heatmap(
-            x=pivot_table.columns,
-            y=pivot_table.index,
-            z=pivot_table.values,
-            colorscale='Viridis'
-        )
-
-        layout = go.Layout(
-            title='Funding Amount by Year and Month',
-            xaxis={'title': x_axis},
-            yaxis={'title': y_axis}
-        )
-
-        fig = go.Figure(data=[heatmap], layout=layout)
-        st.plotly_chart(fig, use_container_width=True)
+        with timing.stage('build:' + layout_title):
+            import plotly.graph_objects as go
+
+            heatmap = go.Heatmap(
+                x=pivot_table.columns,
+                y=pivot_table.index,
+                z=pivot_table.values,
+                colorscale='Viridis'
+            )
+
+            layout = go.Layout(
+                title=layout_title,
+                xaxis={'title': x_axis, 'type': 'category'},
+                yaxis={'title': y_axis, 'type': 'category', 'autorange': 'reversed'}
+            )
+
+            fig = go.Figure(data=[heatmap], layout=layout)
+
+        with timing.stage('render:' + layout_title):
+            st.plotly_chart(fig, use_container_width=True)
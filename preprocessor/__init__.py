@@ -1 +1,6 @@
-from .preprocessor import Preprocess
\ No newline at end of file
+from .preprocessor import Preprocess
+from .preprocessor import ChunkedPreprocess
+from .preprocessor import open_chat_export
+from .cache import ChatCache
+from . import timing
+from . import backend
\ No newline at end of file
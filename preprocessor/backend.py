@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+"""
+This module selects the dataframe backend that parses chats and runs the
+per-message steps of the analysis.
+
+The 'pandas' backend is the default. The 'polars' backend runs the same
+steps on the multi-threaded string and groupby engine of Polars and returns
+identical pandas DataFrames, so the rest of the app does not change. Pick
+it per call, or for every run with the `WHATSAPP_ANALYSER_BACKEND`
+environment variable.
+
+@author: Abhishek Santosh Gupta
+@github: github.com/1abhi6
+"""
+
+import os
+import importlib.util
+
+
+# Set this environment variable to pick the backend of every run
+BACKEND_ENV = 'WHATSAPP_ANALYSER_BACKEND'
+
+# Known backends, the first one is the default
+BACKENDS = ('pandas', 'polars')
+
+
+def resolve(backend=None):
+    """
+    Resolve the dataframe backend of a run.
+
+    Parameters:
+    - backend (str, optional): 'pandas' or 'polars'. Defaults to the
+      `BACKEND_ENV` environment variable, then to 'pandas'.
+
+    Returns:
+    - str: Name of the backend.
+
+    Raises:
+    - ValueError: If the backend is unknown.
+    - ImportError: If the 'polars' backend is chosen but Polars is not installed.
+    """
+    backend = backend or os.environ.get(BACKEND_ENV) or BACKENDS[0]
+    if backend not in BACKENDS:
+        raise ValueError('Unknown backend {!r}, expected one of {}.'.format(
+            backend, ', '.join(BACKENDS)))
+
+    if backend == 'polars' and importlib.util.find_spec('polars') is None:
+        raise ImportError(
+            "The 'polars' backend needs Polars, install it with `pip install polars`.")
+
+    return backend
@@ -0,0 +1,324 @@
+# -*- coding: utf-8 -*-
+"""
+This module provides a ChatCache class for storing parsed chats on disk.
+
+Every parsed chat is written as a Parquet file named after a hash of the
+uploaded bytes and the parser version, so uploading the same export again
+skips parsing completely. The cache is kept under a size limit by evicting
+the least recently used chats first.
+
+Next to every chat a small JSON manifest records the time and a hash of its
+last messages, so a later export of the same chat only has its new messages
+parsed and appended to the cached ones.
+
+@author: Abhishek Santosh Gupta
+@github: github.com/1abhi6
+"""
+
+import os
+import json
+import hashlib
+import pandas as pd
+
+from .preprocessor import PARSER_VERSION, COMPACT_DTYPES, ChunkedPreprocess, concat_chats
+
+
+# Directory the parsed chats are cached in
+CACHE_DIR = './.cache/chats'
+
+# Total size of the cached chats above which the oldest ones are evicted
+CACHE_MAX_BYTES = 512 * 1024 * 1024
+
+# Number of bytes hashed at a time
+HASH_BLOCK_SIZE = 1024 * 1024
+
+# Number of last messages that must reappear in a new export to extend a chat
+TAIL_MESSAGES = 20
+
+# Number of most recently used chats tried when extending a chat
+EXTEND_CANDIDATES = 8
+
+# Number of characters of a tail message searched for in a new export
+TAIL_TEXT_CHARS = 256
+
+
+def tail_hash(df):
+    """
+    Hash the time, sender and text of the given messages.
+
+    Parameters:
+    - df (pandas.DataFrame): Parsed chat messages.
+
+    Returns:
+    - str: Hex digest of the messages, the same for either schema.
+    """
+    rows = df[['datetime', 'users', 'message']].astype(str)
+
+    # The last message of an export keeps the file's final newline
+    rows['message'] = rows['message'].str.rstrip('\n')
+    digest = hashlib.sha256()
+    for row in rows.itertuples(index=False):
+        digest.update('\x1f'.join(row).encode() + b'\x1e')
+
+    return digest.hexdigest()
+
+
+class ChatCache:
+    """
+    Content-addressed cache of parsed chat DataFrames stored as Parquet.
+    """
+
+    def __init__(self, directory=CACHE_DIR, max_bytes=CACHE_MAX_BYTES):
+        """
+        Initialize the ChatCache class.
+
+        Parameters:
+        - directory (str): Directory the parsed chats are cached in.
+        - max_bytes (int): Total size of the cache before eviction starts.
+        """
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(self.directory, exist_ok=True)
+
+    def key(self, file, compact=False):
+        """
+        Hash an uploaded export into its cache key.
+
+        Parameters:
+        - file (file-like): Binary file object of the uploaded export.
+        - compact (bool): Whether the chat is parsed with the compact schema.
+
+        Returns:
+        - str: Hex digest of the parser version, schema and file contents.
+        """
+        digest = hashlib.sha256()
+        digest.update('{}:{}:'.format(PARSER_VERSION, int(compact)).encode())
+
+        file.seek(0)
+        for block in iter(lambda: file.read(HASH_BLOCK_SIZE), b''):
+            digest.update(block)
+        file.seek(0)
+
+        return digest.hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + '.parquet')
+
+    def _manifest_path(self, key):
+        return os.path.join(self.directory, key + '.json')
+
+    def manifest(self, key):
+        """
+        Load the manifest of a cached chat.
+
+        Parameters:
+        - key (str): Cache key from `key()`.
+
+        Returns:
+        - dict or None: Schema, tail and extended chat of the cached chat,
+          None if it has no manifest.
+        """
+        try:
+            with open(self._manifest_path(key), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def get(self, key, compact=False):
+        """
+        Load a cached chat and mark it as recently used.
+
+        Parameters:
+        - key (str): Cache key from `key()`.
+        - compact (bool): Whether the chat was parsed with the compact schema.
+
+        Returns:
+        - pandas.DataFrame or None: The cached chat, None on a cache miss.
+        """
+        path = self._path(key)
+        try:
+            df = pd.read_parquet(path)
+        except FileNotFoundError:
+            return None
+
+        os.utime(path)
+
+        # Parquet restores Arrow-backed strings as Python strings
+        if compact:
+            df = df.astype(COMPACT_DTYPES)
+
+        return df
+
+    def put(self, key, df, compact=False, base=None):
+        """
+        Store a parsed chat and evict the least recently used chats above
+        the size limit.
+
+        Parameters:
+        - key (str): Cache key from `key()`.
+        - df (pandas.DataFrame): The parsed chat.
+        - compact (bool): Whether the chat uses the compact schema.
+        - base (tuple, optional): Key and number of messages of the cached
+          chat this one extends, as returned by `extend()`.
+        """
+        path = self._path(key)
+        temp_path = path + '.tmp'
+        df.to_parquet(temp_path, index=False)
+        os.replace(temp_path, path)
+
+        tail = df.tail(TAIL_MESSAGES)
+
+        # The longest tail message, searched for before parsing a new export
+        messages = tail['message'].astype(str).str.rstrip('\n')
+        tail_text = max(messages, key=len, default='')[:TAIL_TEXT_CHARS]
+
+        manifest = {
+            'compact': bool(compact),
+            'since': tail['datetime'].iloc[0].isoformat() if len(tail) else None,
+            'tail_rows': len(tail),
+            'tail_hash': tail_hash(tail),
+            'tail_text': tail_text,
+            'extends': base,
+        }
+        with open(self._manifest_path(key), 'w', encoding='utf-8') as f:
+            json.dump(manifest, f)
+
+        self.evict()
+
+    def extend(self, file, compact=False):
+        """
+        Find a cached chat the uploaded export continues, and parse only the
+        messages added after it.
+
+        A cached chat is continued when its last `TAIL_MESSAGES` messages
+        appear in the export, the messages after them are the new ones.
+        Chats whose longest tail message is not in the export are ruled out
+        before parsing, the export is then parsed once from the earliest tail
+        left and every chat left is checked against it.
+
+        Parameters:
+        - file (file-like): Binary file object of the chat text.
+        - compact (bool): Whether the chat is parsed with the compact schema.
+
+        Returns:
+        - tuple or None: The merged chat and its base, the key of the cached
+          chat and its number of messages, which the merged chat starts with.
+          None if no cached chat is continued.
+        """
+        candidates = []
+        for key in self.entries()['Key'].head(EXTEND_CANDIDATES):
+            manifest = self.manifest(key)
+            if manifest is None or manifest['compact'] != compact or not manifest['tail_rows']:
+                continue
+            candidates.append((key, manifest))
+
+        candidates = self._find_tails(file, candidates)
+        if not candidates:
+            return None
+
+        recent = ChunkedPreprocess(file).text_to_df(compact=compact, since=min(
+            pd.Timestamp(manifest['since']) for _, manifest in candidates))
+
+        for key, manifest in candidates:
+            since = pd.Timestamp(manifest['since'])
+            rows = manifest['tail_rows']
+
+            # The tail starts at one of the messages sent at its first minute
+            for start in (recent['datetime'] == since).to_numpy().nonzero()[0]:
+                if tail_hash(recent.iloc[start:start + rows]) != manifest['tail_hash']:
+                    continue
+
+                df = self.get(key, compact)
+                if df is None:
+                    break
+                messages = len(df)
+
+                # Take the tail from the new export too, its last message no
+                # longer ends the file
+                df.drop(index=df.index[messages - rows:], inplace=True)
+                added = recent.iloc[start:].reset_index(drop=True)
+                return concat_chats([df, added], compact), (key, messages)
+
+        return None
+
+    def _find_tails(self, file, candidates):
+        """
+        Search the raw export once for the tail text of every candidate chat.
+
+        Parameters:
+        - file (file-like): Binary file object of the chat text.
+        - candidates (list): (key, manifest) of every candidate chat.
+
+        Returns:
+        - list: The candidates whose tail text is in the export, or whose
+          manifest predates tail texts, in their original order.
+        """
+        pending = {key: manifest['tail_text'].encode()
+                   for key, manifest in candidates if 'tail_text' in manifest}
+        found = {key for key, _ in candidates if key not in pending}
+
+        # Keep the end of every block in case a text spans two of them
+        overlap = max(map(len, pending.values()), default=0)
+        previous = b''
+
+        file.seek(0)
+        while pending:
+            block = file.read(HASH_BLOCK_SIZE)
+            if not block:
+                break
+            text = previous + block
+            for key, needle in list(pending.items()):
+                if needle in text:
+                    found.add(key)
+                    del pending[key]
+            previous = text[-overlap:]
+        file.seek(0)
+
+        return [(key, manifest) for key, manifest in candidates if key in found]
+
+    def entries(self):
+        """
+        List the cached chats, most recently used first.
+
+        Returns:
+        - pandas.DataFrame: Key, size in bytes and last use of every chat.
+        """
+        entries = []
+        for name in os.listdir(self.directory):
+            if not name.endswith('.parquet'):
+                continue
+            stat = os.stat(os.path.join(self.directory, name))
+            entries.append({
+                'Key': name[:-len('.parquet')],
+                'Size (Bytes)': stat.st_size,
+                'Last Used': pd.Timestamp(stat.st_mtime, unit='s'),
+            })
+
+        entries = pd.DataFrame(entries, columns=['Key', 'Size (Bytes)', 'Last Used'])
+        return entries.sort_values('Last Used', ascending=False, ignore_index=True)
+
+    def evict(self):
+        """
+        Remove the least recently used chats until the cache fits in
+        `max_bytes`.
+        """
+        entries = self.entries()
+        total = entries['Size (Bytes)'].sum()
+
+        for key, size in zip(entries['Key'][::-1], entries['Size (Bytes)'][::-1]):
+            if total <= self.max_bytes:
+                break
+            self._remove(key)
+            total -= size
+
+    def clear(self):
+        """
+        Remove every cached chat.
+        """
+        for key in self.entries()['Key']:
+            self._remove(key)
+
+    def _remove(self, key):
+        os.remove(self._path(key))
+        if os.path.exists(self._manifest_path(key)):
+            os.remove(self._manifest_path(key))
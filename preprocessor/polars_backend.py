@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+"""
+This module builds the processed chat DataFrame with Polars, see
+`preprocessor.backend`.
+
+Every column is computed on the Polars engine and the result is handed
+back as a pandas DataFrame identical to the one the pandas backend builds.
+
+@author: Abhishek Santosh Gupta
+@github: github.com/1abhi6
+"""
+
+import polars as pl
+
+from .preprocessor import PERIODS
+
+
+# Sender and message of a message body. Python's \s also matches the
+# \x1c-\x1f separators, Polars' does not, so they are added explicitly.
+SENDER_MESSAGE_PATTERN = r'^([\w\W]+?):[\s\x1c-\x1f]([\w\W]*)'
+
+# Period label of every hour of the day
+HOUR_PERIODS = dict(enumerate(PERIODS.tolist()))
+
+
+def entries_to_df(entries, date_format, since=None):
+    """
+    Build the processed chat DataFrame from (date, body) entries.
+
+    Parameters:
+    - entries (iterable): (date string, message body) of every message.
+    - date_format (str): Format of the date strings.
+    - since (pandas.Timestamp, optional): Only keep the messages sent at
+      or after this time.
+
+    Returns:
+    - df (pandas.DataFrame): DataFrame containing processed chat data, with
+      the columns and dtypes of the pandas backend.
+    """
+    entries = list(entries)
+    frame = pl.DataFrame({
+        'date': [date for date, _ in entries],
+        'user_message': [body for _, body in entries],
+    }, schema={'date': pl.String, 'user_message': pl.String})
+
+    timestamp = pl.col('date').str.strptime(pl.Datetime('ns'), date_format)
+
+    # Python reads two-digit year 69 as 1969, Polars as 2069
+    if '%y' in date_format:
+        timestamp = pl.when(timestamp.dt.year() == 2069).then(
+            timestamp.dt.offset_by('-100y')).otherwise(timestamp)
+
+    frame = frame.with_columns(timestamp.alias('datetime'))
+
+    # Drop older messages before the rest of the parsing
+    if since is not None:
+        frame = frame.filter(pl.col('datetime') >= since.to_pydatetime())
+
+    # Separate users and messages, bodies without a sender are notifications
+    entry = pl.col('user_message').str.extract_groups(SENDER_MESSAGE_PATTERN)
+    timestamp = pl.col('datetime').dt
+    frame = frame.select(
+        'datetime',
+        entry.struct.field('1').fill_null('Group Notification').alias('users'),
+        entry.struct.field('2').fill_null(pl.col('user_message')).alias('message'),
+        timestamp.year().cast(pl.Int64).alias('year'),
+        timestamp.strftime('%B').alias('month'),
+        timestamp.day().cast(pl.Int64).alias('day'),
+        timestamp.strftime('%A').alias('day_name'),
+        timestamp.hour().cast(pl.Int64).alias('hour'),
+        timestamp.hour().replace_strict(HOUR_PERIODS, return_dtype=pl.String).alias('Period'),
+    )
+
+    df = frame.to_pandas()
+
+    # Dates are stored as datetime.date objects, like the pandas backend
+    df.insert(8, 'date', df['datetime'].dt.date)
+
+    return df
@@ -6,14 +6,16 @@ structured pandas DataFrame.
 The Preprocess class defines a method, `text_to_df()`, which takes a 
 string of chat data and performs the following preprocessing steps:
 
-1. Splits the data into individual messages based on a specific pattern.
-2. Extracts the dates from the messages and cleans the date strings.
-3. Creates a DataFrame with columns for user, message, and date.
-4. Converts the date column to datetime format.
-5. Separates the user and message components from each message.
-6. Appends the user and message data to the DataFrame.
-7. Extracts year, month, day, hour, and minute information from the date.
-8. Drops the unnecessary date column from the DataFrame.
+1. Detects the export layout from a sample of the first lines, then walks
+   the data once, yielding the date and body of each message.
+2. Builds a DataFrame from those entries in a single step.
+3. Converts the date column to datetime format with the layout's format.
+4. Separates the user and message components with one vectorized regex.
+5. Extracts year, month, day, hour and date information from the date.
+6. Maps every hour to its period label with a lookup table.
+
+The ChunkedPreprocess class runs the same steps over a binary chat export
+one fixed-size block at a time, to bound the peak memory of large uploads.
 
 Created on Sun Jun  4 00:39:53 2023
 
@@ -22,8 +24,241 @@ Created on Sun Jun  4 00:39:53 2023
 """
 
 import re
+import codecs
+import zipfile
+from collections import namedtuple
+from itertools import chain, islice
+
+import numpy as np
 import pandas as pd
 
+from . import timing
+from . import backend as backends
+
+
+# Version of the parsed DataFrame layout, bump it whenever the output of
+# `text_to_df()` changes so cached chats are parsed again
+PARSER_VERSION = 1
+
+# Header that starts every Android message, e.g. "04/06/23, 12:39\u202fam - "
+HEADER_PATTERN = re.compile(
+    r'\n?(\d{1,2}/\d{1,2}/\d{2,4}, \d{1,2}:\d{2}(?:[\u202f ]?[aApP][mM])?) - ')
+
+# Header that starts every iOS message, e.g. "[04/06/23, 12:39:45 AM] "
+IOS_HEADER_PATTERN = re.compile(
+    r'\n?\u200e?\[(\d{1,2}/\d{1,2}/\d{2,4}, \d{1,2}:\d{2}:\d{2}(?:[\u202f ]?[aApP][mM])?)\] ')
+
+# A known WhatsApp export layout: the header pattern, whose first group is
+# the message date, and the exact format to parse that date with
+TimestampFormat = namedtuple('TimestampFormat', ['name', 'header', 'date_format'])
+
+# Known WhatsApp export layouts, tried in order. Day-first layouts come
+# before month-first ones so chats with only ambiguous dates are read day-first.
+TIMESTAMP_FORMATS = [
+    TimestampFormat('android', HEADER_PATTERN, '%d/%m/%y, %I:%M\u202f%p'),
+    TimestampFormat('android-24h', HEADER_PATTERN, '%d/%m/%y, %H:%M'),
+    TimestampFormat('android-4-digit-year', HEADER_PATTERN, '%d/%m/%Y, %I:%M\u202f%p'),
+    TimestampFormat('android-4-digit-year-24h', HEADER_PATTERN, '%d/%m/%Y, %H:%M'),
+    TimestampFormat('android-us', HEADER_PATTERN, '%m/%d/%y, %I:%M\u202f%p'),
+    TimestampFormat('android-us-24h', HEADER_PATTERN, '%m/%d/%y, %H:%M'),
+    TimestampFormat('android-us-4-digit-year', HEADER_PATTERN, '%m/%d/%Y, %I:%M\u202f%p'),
+    TimestampFormat('android-us-4-digit-year-24h', HEADER_PATTERN, '%m/%d/%Y, %H:%M'),
+    TimestampFormat('ios', IOS_HEADER_PATTERN, '%d/%m/%y, %I:%M:%S\u202f%p'),
+    TimestampFormat('ios-24h', IOS_HEADER_PATTERN, '%d/%m/%y, %H:%M:%S'),
+    TimestampFormat('ios-4-digit-year', IOS_HEADER_PATTERN, '%d/%m/%Y, %I:%M:%S\u202f%p'),
+    TimestampFormat('ios-4-digit-year-24h', IOS_HEADER_PATTERN, '%d/%m/%Y, %H:%M:%S'),
+    TimestampFormat('ios-us', IOS_HEADER_PATTERN, '%m/%d/%y, %I:%M:%S\u202f%p'),
+    TimestampFormat('ios-us-24h', IOS_HEADER_PATTERN, '%m/%d/%y, %H:%M:%S'),
+    TimestampFormat('ios-us-4-digit-year', IOS_HEADER_PATTERN, '%m/%d/%Y, %I:%M:%S\u202f%p'),
+    TimestampFormat('ios-us-4-digit-year-24h', IOS_HEADER_PATTERN, '%m/%d/%Y, %H:%M:%S'),
+]
+
+# Number of lines sampled from the start of a chat to detect its layout
+SAMPLE_LINES = 500
+
+# Date fields of a header where the day, 13 or later, cannot be the month
+UNAMBIGUOUS_DATE = r'((?:(?:1[3-9]|2\d|3[01])/\d{1,2}|\d{1,2}/(?:1[3-9]|2\d|3[01]))/'
+
+# Number of bytes read and parsed at a time by `ChunkedPreprocess`
+BLOCK_SIZE = 4 * 1024 * 1024
+
+# Sender and message of a message body, e.g. "Abhishek: Hi", for vectorized extraction
+SENDER_MESSAGE_PATTERN = r'^([\w\W]+?):\s([\w\W]*)'
+
+# Period label for every hour of the day, indexed by hour
+PERIODS = np.array(
+    ['00-1'] + ['{}-{}'.format(hour, hour + 1) for hour in range(1, 23)] + ['23-00'],
+    dtype=object)
+
+# Opt-in compact dtypes for the parsed DataFrame, see `text_to_df(compact=True)`
+COMPACT_DTYPES = {
+    'users': 'category',
+    'message': 'string[pyarrow]',
+    'year': 'int16',
+    'month': 'category',
+    'day': 'int8',
+    'day_name': 'category',
+    'hour': 'int8',
+    'date': 'category',
+    'Period': 'category',
+}
+
+
+def detect_timestamp_format(data, rest=()):
+    """
+    Detect the export layout of the chat data.
+
+    Only the first `SAMPLE_LINES` lines are read, and every sampled date
+    must parse with the exact format of the chosen layout. When the sample
+    parses both day-first and month-first, the rest of the chat decides.
+
+    Parameters:
+    - data (str): The input data containing chat messages.
+    - rest (iterable, optional): Text following `data`, when `data` is only
+      the start of the chat.
+
+    Returns:
+    - TimestampFormat: The first matching layout from `TIMESTAMP_FORMATS`.
+
+    Raises:
+    - ValueError: If no known layout matches the chat data.
+    """
+    end = -1
+    for _ in range(SAMPLE_LINES):
+        end = data.find('\n', end + 1)
+        if end == -1:
+            break
+    sample = data if end == -1 else data[:end + 1]
+
+    dates = {}
+    for timestamp_format in TIMESTAMP_FORMATS:
+        header = timestamp_format.header
+        if header not in dates:
+            dates[header] = pd.Series(
+                [match.group(1) for match in islice(header.finditer(sample), SAMPLE_LINES)],
+                dtype=object)
+
+        if dates[header].empty:
+            continue
+
+        parsed = pd.to_datetime(
+            dates[header], format=timestamp_format.date_format, errors='coerce')
+        if parsed.notna().all():
+            month_first = _month_first_layout(timestamp_format)
+            if month_first is not None and pd.to_datetime(
+                    dates[header], format=month_first.date_format, errors='coerce').notna().all():
+                if not _is_day_first(header, chain([data], rest)):
+                    return month_first
+            return timestamp_format
+
+    raise ValueError(
+        'Unrecognised chat format. Please upload a chat exported from WhatsApp.')
+
+
+def _month_first_layout(timestamp_format):
+    """
+    Find the month-first counterpart of a day-first layout.
+
+    Parameters:
+    - timestamp_format (TimestampFormat): A layout from `TIMESTAMP_FORMATS`.
+
+    Returns:
+    - TimestampFormat or None: The layout with the same header and the day
+      and month swapped, None if the layout is not day-first.
+    """
+    if not timestamp_format.date_format.startswith('%d/%m'):
+        return None
+
+    date_format = '%m/%d' + timestamp_format.date_format[len('%d/%m'):]
+    return next(layout for layout in TIMESTAMP_FORMATS
+                if layout.header is timestamp_format.header and layout.date_format == date_format)
+
+
+def _is_day_first(header, texts):
+    """
+    Search a chat for the first header date that can only be read one way.
+
+    Parameters:
+    - header (re.Pattern): Header pattern of the chat's layout.
+    - texts (iterable): The chat text, whole or in consecutive pieces.
+
+    Returns:
+    - bool: False if that date has the day second, True if it has the day
+      first or every date is ambiguous.
+    """
+    pattern = re.compile(header.pattern.replace(r'(\d{1,2}/\d{1,2}/', UNAMBIGUOUS_DATE, 1))
+
+    # Keep the end of every piece in case a header spans two of them
+    tail = ''
+    for text in texts:
+        text = tail + text
+        match = pattern.search(text)
+        if match is not None:
+            return int(match.group(1).split('/', 1)[0]) > 12
+        tail = text[-64:]
+
+    return True
+
+
+def open_chat_export(file):
+    """
+    Open the chat text of an uploaded export for streaming.
+
+    WhatsApp .zip exports are opened in place: only the chat .txt member is
+    decompressed, as it is read, and media members are never read.
+
+    Parameters:
+    - file (file-like): Binary file object of a .txt or .zip chat export.
+
+    Returns:
+    - file-like: Binary file object of the chat text.
+
+    Raises:
+    - ValueError: If a .zip export contains no chat .txt file.
+    """
+    if not zipfile.is_zipfile(file):
+        file.seek(0)
+        return file
+
+    archive = zipfile.ZipFile(file)
+    members = [member for member in archive.infolist()
+               if not member.is_dir() and member.filename.lower().endswith('.txt')]
+    if not members:
+        raise ValueError('The uploaded .zip file does not contain a chat .txt file.')
+
+    # Android names the chat "WhatsApp Chat with <name>.txt", iOS "_chat.txt"
+    for member in members:
+        name = member.filename.rsplit('/', 1)[-1]
+        if name == '_chat.txt' or name.startswith('WhatsApp Chat'):
+            return archive.open(member)
+
+    return archive.open(members[0])
+
+
+def concat_chats(frames, compact=False):
+    """
+    Concatenate parsed chat DataFrames in order. Compact frames have their
+    categories aligned in place.
+
+    Parameters:
+    - frames (list): Parsed chat DataFrames, oldest messages first.
+    - compact (bool): Whether the frames use the `COMPACT_DTYPES` schema.
+
+    Returns:
+    - pandas.DataFrame: The messages of every frame.
+    """
+    # Frames see different categories, align them so concat keeps them
+    if compact:
+        for column, dtype in COMPACT_DTYPES.items():
+            if dtype != 'category':
+                continue
+            categories = sorted(set().union(
+                *(frame[column].cat.categories for frame in frames)))
+            for frame in frames:
+                frame[column] = frame[column].cat.set_categories(categories)
+
+    return pd.concat(frames, ignore_index=True)
+
 
 class Preprocess:
     def __init__(self, data):
@@ -34,77 +269,262 @@ class Preprocess:
         - data (str): The input data containing chat messages.
         """
         self.data = data
+        self.timestamp_format = detect_timestamp_format(data)
+
+    def _iter_entries(self):
+        """
+        Walk the chat data once and yield the header date and raw body of
+        every message. Any text before the first message header is ignored.
 
-    def text_to_df(self):
+        Yields:
+        - tuple: (date string, message body) for every message.
+        """
+        data = self.data
+        headers = self.timestamp_format.header.finditer(data)
+        header = next(headers, None)
+
+        while header is not None:
+            next_header = next(headers, None)
+            end = next_header.start() if next_header is not None else len(data)
+
+            yield header.group(1), data[header.end():end]
+            header = next_header
+
+    def text_to_df(self, compact=False, since=None, backend=None):
         """
         Convert the chat data into a pandas DataFrame.
 
+        Parameters:
+        - compact (bool): Store the columns with the compact `COMPACT_DTYPES`
+          schema: categoricals for the low-cardinality columns, small ints
+          for the calendar fields and Arrow-backed strings for `message`.
+          This cuts the memory of large chats by roughly 90%.
+        - since (pandas.Timestamp, optional): Only keep the messages sent at
+          or after this time.
+        - backend (str, optional): Dataframe backend parsing the chat, see
+          `preprocessor.backend.resolve()`.
+
         Returns:
         - df (pandas.DataFrame): DataFrame containing processed chat data.
         """
+        backend = backends.resolve(backend)
 
-        # Define the pattern to split the data into messages
-        pattern = r'\n?\d{2}/\d{2}/\d{2,4},\s\d{1,2}:\d{2}\u202f?(?:am|pm|\d{1,2}:\d{2})\s-\s'
+        with timing.stage('parse'):
+            return self._entries_to_df(self._iter_entries(), compact, since, backend)
 
-        # Split the data based on the pattern
-        messages = re.split(pattern, self.data)[1:]
+    def _entries_to_df(self, entries, compact, since=None, backend='pandas'):
+        """
+        Build the processed chat DataFrame from (date, body) entries.
 
-        # Extract the dates using the pattern
-        dates = re.findall(pattern, self.data)
+        Parameters:
+        - entries (iterable): (date string, message body) of every message.
+        - compact (bool): Store the columns with the `COMPACT_DTYPES` schema.
+        - since (pandas.Timestamp, optional): Only keep the messages sent at
+          or after this time.
+        - backend (str): Dataframe backend building the DataFrame.
 
-        # Clean the dates list
-        cleaned_date_strings = [date_string.strip(
-            '\u202f- \n') for date_string in dates]
+        Returns:
+        - df (pandas.DataFrame): DataFrame containing processed chat data.
+        """
+        if backend == 'polars':
+            from . import polars_backend
+            df = polars_backend.entries_to_df(entries, self.timestamp_format.date_format, since)
+        else:
+            df = self._entries_to_pandas_df(entries, since)
 
-        # Create a DataFrame with user messages and date
-        df = pd.DataFrame({
-            'user_message': messages,
-            'date': cleaned_date_strings
-        })
+        if compact:
+            df = df.astype(COMPACT_DTYPES)
 
-        # Convert the date column to datetime format
-        df['datetime'] = pd.to_datetime(
-            df['date'], format='%d/%m/%y, %I:%M\u202f%p')
+        return df
+
+    def _entries_to_pandas_df(self, entries, since=None):
+        """
+        Build the processed chat DataFrame from (date, body) entries with pandas.
+
+        Parameters:
+        - entries (iterable): (date string, message body) of every message.
+        - since (pandas.Timestamp, optional): Only keep the messages sent at
+          or after this time.
+
+        Returns:
+        - df (pandas.DataFrame): DataFrame containing processed chat data.
+        """
+        # Build the DataFrame in bulk from the parsed message entries
+        df = pd.DataFrame.from_records(entries, columns=['date', 'user_message'])
 
-        # Separate users and messages
-        users = []
-        messages = []
+        # Convert the date column to datetime format
+        df.insert(0, 'datetime', pd.to_datetime(
+            df['date'], format=self.timestamp_format.date_format))
 
-        for message in df['user_message']:
-            entry = re.split('([\w\W]+?):\s', message)
-            if entry[1:]:
-                users.append(entry[1])
-                messages.append(entry[2])
-            else:
-                users.append('Group Notification')
-                messages.append(entry[0])
+        # Drop older messages before the rest of the parsing
+        if since is not None:
+            df = df[df['datetime'] >= since].reset_index(drop=True)
 
-        df['users'] = users
-        df['message'] = messages
-        df.drop(columns=['user_message'], inplace=True)
+        # Separate users and messages, bodies without a sender are notifications
+        entry = df['user_message'].str.extract(SENDER_MESSAGE_PATTERN)
+        df['users'] = entry[0].fillna('Group Notification')
+        df['message'] = entry[1].fillna(df['user_message'])
 
-        # Drop the date column since it is not required
-        df.drop(columns='date', inplace=True)
+        # Drop the raw body and date columns since they are not required
+        df.drop(columns=['user_message', 'date'], inplace=True)
 
         # Extract year, month, day, hour, and date from the datetime column
-        df['year'] = df['datetime'].dt.year
-        df['month'] = df['datetime'].dt.month_name()
-        df['day'] = df['datetime'].dt.day
-        df['day_name'] = df['datetime'].dt.day_name()
-        df['hour'] = df['datetime'].dt.hour
-        df['date'] = df['datetime'].dt.date
-        
+        timestamp = df['datetime'].dt
+        df['year'] = timestamp.year
+        df['month'] = timestamp.month_name()
+        df['day'] = timestamp.day
+        df['day_name'] = timestamp.day_name()
+        df['hour'] = timestamp.hour
+        df['date'] = timestamp.date
+
         # Add period of an hour as Period column in the df
-        period = []
-        for hour in df[['day_name', 'hour']]['hour']:
-            if hour == 23:
-                period.append(str(hour) + "-" + str('00'))
-            elif hour == 0:
-                period.append(str('00') + "-" + str(hour + 1))
-            else:
-                period.append(str(hour) + "-" + str(hour + 1))
-                
-        df['Period'] = period
-        
+        df['Period'] = PERIODS[df['hour'].to_numpy()]
+
         return df
-    
\ No newline at end of file
+
+
+class ChunkedPreprocess(Preprocess):
+    """
+    Preprocess a binary chat export in fixed-size blocks.
+
+    Only one decoded block and the DataFrames of the blocks parsed so far
+    are held at a time, instead of the whole decoded text and every
+    intermediate list. Messages spanning a block boundary are carried over
+    to the next block.
+    """
+
+    def __init__(self, file, block_size=BLOCK_SIZE):
+        """
+        Initialize the ChunkedPreprocess class.
+
+        Parameters:
+        - file (file-like): Binary file object of a UTF-8 encoded chat export.
+        - block_size (int): Number of bytes read and parsed at a time.
+        """
+        self.file = file
+        self.block_size = block_size
+        self.timestamp_format = None
+
+    def _iter_blocks(self):
+        """
+        Read the file block by block and yield the complete entries of each.
+
+        The layout is detected once the first `SAMPLE_LINES` lines are read.
+
+        Yields:
+        - list: (date string, message body) of every message completed by
+          the block.
+        """
+        self.file.seek(0)
+        decoder = codecs.getincrementaldecoder('utf-8')()
+        buffer = ''
+
+        while True:
+            with timing.stage('decode', accumulate=True):
+                block = self.file.read(self.block_size)
+                buffer += decoder.decode(block, final=not block)
+
+            if self.timestamp_format is None:
+                if block and buffer.count('\n') < SAMPLE_LINES:
+                    continue
+                # An ambiguous start is resolved by reading ahead, then reading
+                # resumes where it was
+                position = self.file.tell()
+                self.timestamp_format = detect_timestamp_format(buffer, self._read_ahead())
+                self.file.seek(position)
+
+            with timing.stage('split', accumulate=True):
+                headers = list(self.timestamp_format.header.finditer(buffer))
+
+                # The last message may continue in the next block, keep it back
+                end = len(buffer)
+                if block:
+                    end = headers.pop().start() if headers else 0
+
+                starts = [header.start() for header in headers[1:]] + [end]
+                entries = [(header.group(1), buffer[header.end():start])
+                           for header, start in zip(headers, starts)]
+                buffer = buffer[end:]
+
+            yield entries
+
+            if not block:
+                return
+
+    def _read_ahead(self):
+        """
+        Decode the rest of the file block by block. Characters split by the
+        first block are dropped, headers are ASCII.
+
+        Yields:
+        - str: The text of every block.
+        """
+        decoder = codecs.getincrementaldecoder('utf-8')(errors='ignore')
+
+        while True:
+            block = self.file.read(self.block_size)
+            yield decoder.decode(block, final=not block)
+
+            if not block:
+                return
+
+    def _iter_entries(self):
+        """
+        Yield the header date and raw body of every message in the file.
+
+        Yields:
+        - tuple: (date string, message body) for every message.
+        """
+        for entries in self._iter_blocks():
+            yield from entries
+
+    def iter_frames(self, compact=False, since=None, backend=None):
+        """
+        Parse the chat export one block at a time and yield the DataFrame of
+        every block, so only one block is held in memory at a time.
+
+        Parameters:
+        - compact (bool): Store the columns with the `COMPACT_DTYPES` schema.
+        - since (pandas.Timestamp, optional): Only parse the messages sent at
+          or after this time. Blocks whose last message is older are skipped
+          after reading its date.
+        - backend (str, optional): Dataframe backend parsing the chat, see
+          `preprocessor.backend.resolve()`.
+
+        Yields:
+        - pandas.DataFrame: Processed messages of every non-empty block, in order.
+        """
+        backend = backends.resolve(backend)
+
+        for entries in self._iter_blocks():
+            if not entries:
+                continue
+            if since is not None and pd.to_datetime(
+                    entries[-1][0], format=self.timestamp_format.date_format) < since:
+                continue
+            with timing.stage('parse', accumulate=True):
+                frame = self._entries_to_df(entries, compact, since, backend)
+            yield frame
+
+    def text_to_df(self, compact=False, since=None, backend=None):
+        """
+        Convert the chat export into a pandas DataFrame, one block at a time.
+
+        Parameters:
+        - compact (bool): Store the columns with the `COMPACT_DTYPES` schema.
+        - since (pandas.Timestamp, optional): Only parse the messages sent at
+          or after this time. Blocks whose last message is older are skipped
+          after reading its date.
+        - backend (str, optional): Dataframe backend parsing the chat, see
+          `preprocessor.backend.resolve()`.
+
+        Returns:
+        - df (pandas.DataFrame): DataFrame containing processed chat data.
+        """
+        frames = list(self.iter_frames(compact, since, backend))
+
+        if not frames:
+            return self._entries_to_df([], compact, backend=backends.resolve(backend))
+
+        with timing.stage('parse', accumulate=True):
+            return concat_chats(frames, compact)
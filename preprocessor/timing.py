@@ -0,0 +1,126 @@
+# -*- coding: utf-8 -*-
+"""
+This module provides lightweight timing of the stages of a run: decoding,
+parsing, every metric and every chart.
+
+Timing is off by default, `stage()` then costs a single flag check. Once
+enabled with `enable()`, every stage is recorded for the current thread,
+so each Streamlit session sees only its own rerun, and logged as one JSON
+line on the `preprocessor.timing` logger.
+
+Setting the `WHATSAPP_ANALYSER_TIMING` environment variable times every
+run, scripts included, and prints those lines on stderr unless logging is
+already configured.
+
+@author: Abhishek Santosh Gupta
+@github: github.com/1abhi6
+"""
+
+import os
+import json
+import time
+import logging
+import threading
+from contextlib import contextmanager
+
+import pandas as pd
+
+
+logger = logging.getLogger(__name__)
+
+# Set this environment variable to time and log every run
+TIMING_ENV = 'WHATSAPP_ANALYSER_TIMING'
+
+# Whether threads that never call `enable()` are timed
+ENV_ENABLED = bool(os.environ.get(TIMING_ENV))
+
+_state = threading.local()
+
+
+def _log_to_stderr():
+    """
+    Print the timing lines on stderr, unless a handler is configured already.
+    """
+    if not logger.hasHandlers():
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter('%(message)s'))
+        logger.addHandler(handler)
+    logger.setLevel(logging.INFO)
+
+
+if ENV_ENABLED:
+    _log_to_stderr()
+
+
+def enable(enabled=True):
+    """
+    Turn timing on or off for the current thread and start a new run.
+
+    Parameters:
+    - enabled (bool): Whether the stages are timed. Timing stays on when the
+      `TIMING_ENV` environment variable is set.
+    """
+    _state.enabled = enabled or bool(os.environ.get(TIMING_ENV))
+    _state.origin = time.perf_counter()
+    _state.records = []
+
+
+def is_enabled():
+    """
+    Check whether the stages of the current thread are timed.
+
+    Returns:
+    - bool: True if timing is on.
+    """
+    return getattr(_state, 'enabled', ENV_ENABLED)
+
+
+@contextmanager
+def stage(name, accumulate=False):
+    """
+    Time the enclosed block as a stage of the current run.
+
+    Parameters:
+    - name (str): Name of the stage, e.g. 'parse' or 'metric:timeline'.
+    - accumulate (bool): Add the time to an earlier stage of the same name,
+      for stages run once per block.
+    """
+    if not getattr(_state, 'enabled', ENV_ENABLED):
+        yield
+        return
+
+    # Threads timed by the environment variable start their run here
+    if not hasattr(_state, 'records'):
+        enable()
+
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - start
+        offset = start - _state.origin
+
+        earlier = None
+        if accumulate:
+            earlier = next((record for record in _state.records
+                            if record['stage'] == name), None)
+
+        if earlier is not None:
+            earlier['seconds'] += seconds
+        else:
+            _state.records.append({'stage': name, 'start': offset, 'seconds': seconds})
+
+        logger.info(json.dumps({'stage': name, 'start': round(offset, 6),
+                                'seconds': round(seconds, 6)}))
+
+
+def records():
+    """
+    List the stages timed in the current run.
+
+    Returns:
+    - pandas.DataFrame: Stage, start offset and seconds of every stage, in
+      the order they started.
+    """
+    frame = pd.DataFrame(getattr(_state, 'records', []), columns=['stage', 'start', 'seconds'])
+    return frame.sort_values('start', kind='stable', ignore_index=True)